@@ -0,0 +1,171 @@
+#! /usr/bin/env python
+"""
+This program compares the codecs the web cache can compress entries with, by
+the size of the compressed entries and the time it takes to compress and to
+decompress them, over the same thread fixtures as bench/micro.py.
+
+Every codec available is measured at its default level, and at every level
+given with --levels that it accepts. Entries are measured one at a time as
+the cache stores them, so small threads gain more from the preset dictionary
+of zlib-dict than the totals of a few large fixtures show, --cache-file
+measures the threads of a real cache instead.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+base = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, base)
+
+from iwi.web import Codec
+
+from micro import load_fixtures
+from micro import measure
+from micro import revision
+
+def make_codecs (names, levels):
+    """
+    Returns the codecs to measure as (label, codec) pairs.
+    """
+    codecs = []
+
+    for name in names:
+        codecs.append((name, Codec(name)))
+
+        if name in Codec.levels:
+            lower, upper = Codec.levels[name]
+
+            for level in levels:
+                if lower <= level <= upper and level != Codec.default_levels[name]:
+                    codecs.append (
+                        ('{}:{}'.format(name, level), Codec(name, level))
+                    )
+
+    return codecs
+
+def compare (fixtures, codec, repeat, min_time):
+    """
+    Returns the compressed size of the fixtures along with the seconds it
+    takes to compress and to decompress all of them.
+    """
+    compressed = [codec.compress(contents) for contents in fixtures]
+
+    for contents, entry in zip(fixtures, compressed):
+        if codec.decompress(entry) != contents:
+            raise ValueError ('{} does not round-trip'.format(codec.name))
+
+    def compress ():
+        for contents in fixtures:
+            codec.compress(contents)
+
+    def decompress ():
+        for entry in compressed:
+            codec.decompress(entry)
+
+    return (
+        sum(map(len, compressed)),
+        measure(compress, repeat, min_time),
+        measure(decompress, repeat, min_time)
+    )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser (
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Compares the cache codecs over thread fixtures.'
+    )
+
+    parser.add_argument (
+        '--fixtures',
+        metavar='directory', default=os.path.join(base, 'bench', 'fixtures'),
+        help='directory with thread JSON files, defaults to bench/fixtures'
+    )
+
+    parser.add_argument (
+        '--cache-file',
+        metavar='file',
+        help='take the fixtures from the threads in a cache file instead'
+    )
+
+    parser.add_argument (
+        '--limit',
+        metavar='n', type=int, default=200,
+        help='threads to take from --cache-file, defaults to 200'
+    )
+
+    parser.add_argument (
+        '--codecs', nargs='+', metavar='name',
+        choices=Codec.available(), default=Codec.available(),
+        help='codecs to measure, defaults to every one available'
+    )
+
+    parser.add_argument (
+        '--levels', nargs='+', metavar='n', type=int, default=[1, 9],
+        help='levels to measure besides the default one, defaults to 1 and 9'
+    )
+
+    parser.add_argument (
+        '--repeat',
+        metavar='n', type=int, default=3,
+        help='rounds per measurement, the best one counts, defaults to 3'
+    )
+
+    parser.add_argument (
+        '--min-time',
+        metavar='seconds', type=float, default=0.2,
+        help='minimum duration of a round, defaults to 0.2'
+    )
+
+    parser.add_argument (
+        '--output',
+        metavar='file', type=argparse.FileType('w'),
+        help='file to save the results to as JSON'
+    )
+
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args)
+
+    if not fixtures:
+        print >> sys.stderr, 'no fixtures found'
+        exit(1)
+
+    size = sum(map(len, fixtures))
+    results = {}
+
+    print >> sys.stdout, '{} threads, {:.2f} MB'.format(len(fixtures), size / 1e6)
+    print >> sys.stdout, '{:<14} {:>10} {:>7} {:>14} {:>15} {:>10}'.format (
+        'codec', 'bytes', 'ratio', 'compress MB/s', 'decompress MB/s',
+        'us/thread'
+    )
+
+    for label, codec in make_codecs(args.codecs, args.levels):
+        compressed, compressing, decompressing = compare (
+            fixtures, codec, args.repeat, args.min_time
+        )
+
+        results[label] = {
+            'bytes'      : compressed,
+            'compress'   : compressing,
+            'decompress' : decompressing
+        }
+
+        print >> sys.stdout, '{:<14} {:>10} {:>7.3f} {:>14.1f} {:>15.1f} {:>10.1f}'.format (
+            label, compressed, float(compressed) / size,
+            size / compressing / 1e6, size / decompressing / 1e6,
+            decompressing / len(fixtures) * 1e6
+        )
+        sys.stdout.flush()
+
+    if args.output:
+        json.dump (
+            {
+                'revision' : revision(),
+                'threads'  : len(fixtures),
+                'bytes'    : size,
+                'results'  : results
+            },
+            args.output, indent=2, sort_keys=True
+        )
+        print >> args.output
@@ -0,0 +1,218 @@
+#! /usr/bin/env python
+"""
+This program benchmarks the programs end to end against bench/server.py.
+
+A stand-in server is started on a free port and every scenario runs one of
+the programs against it as a separate process with a fresh cache file unless
+the scenario reuses the cache of the one before it. For every scenario the
+wall time, the requests the server answered, the throughput and the peak
+resident memory of the program are reported.
+
+Arguments not recognized by this program are passed on to the server, so the
+size of the synthetic site and the injected latency and errors can be set,
+e.g. --threads 300 --latency 0.01 --throttle-rate 0.01.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib2
+
+base = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# name, program, arguments, whether the cache of the previous scenario is kept
+scenarios = [
+    ('build_cache cold',       'build_cache.py', [], False),
+    ('build_cache warm',       'build_cache.py', [], True),
+    ('build_cache incremental','build_cache.py', ['--incremental'], True),
+    ('build_cache async',      'build_cache.py', ['--engine', 'async'], False),
+    ('crack',                  'crack.py', ['{public}', '{secure}'], False),
+    ('crack offline',          'crack.py', ['{public}', '{secure}', '--offline'], True),
+    ('dump_hashes offline',    'dump_hashes.py', ['--offline', '{out}'], True),
+    ('dump_words offline',     'dump_words.py', ['--offline', '{out}'], True),
+    ('dump_ngrams offline',    'dump_ngrams.py', ['--offline', '{out}', '2'], True)
+]
+
+def start_server (server_args):
+    """
+    Starts the stand-in server on a free port and returns the process and the
+    address it listens on.
+    """
+    server = subprocess.Popen (
+        [sys.executable, os.path.join(base, 'bench', 'server.py'),
+         '--port', '0'] + server_args,
+        stdout=subprocess.PIPE
+    )
+
+    line = server.stdout.readline()
+
+    if not line.startswith('listening on '):
+        server.kill()
+        raise RuntimeError ('the server did not start')
+
+    return server, line.split()[-1]
+
+def server_stats (address):
+    """
+    Returns the counters of the server.
+    """
+    return json.load(urllib2.urlopen('http://{}/stats'.format(address)))
+
+def make_databases (directory):
+    """
+    Writes tiny tripcode databases with a solution for a tripcode the server
+    hands out and returns their names.
+    """
+    names = []
+
+    for name in ('public.db3', 'secure.db3'):
+        name = os.path.join(directory, name)
+
+        db_connection = sqlite3.connect(name)
+        db_connection.execute (
+            'CREATE TABLE solutions (tripcode TEXT PRIMARY KEY, solution TEXT)'
+        )
+        db_connection.execute (
+            'INSERT INTO solutions VALUES (?,?)', ('Ep8pui8Vw2', 'faggot')
+        )
+        db_connection.commit()
+        db_connection.close()
+
+        names.append(name)
+
+    return names
+
+def run (command):
+    """
+    Runs a command and returns its exit status, the wall time and the peak
+    resident memory in kilobytes.
+    """
+    with open(os.devnull, 'w') as devnull:
+        started = time.time()
+        child = subprocess.Popen(command, stdout=devnull)
+        _, status, usage = os.wait4(child.pid, 0)
+        elapsed = time.time() - started
+
+    if os.WIFEXITED(status):
+        status = os.WEXITSTATUS(status)
+    else:
+        status = -os.WTERMSIG(status)
+
+    # ru_maxrss is in bytes on Mac OS X and in kilobytes elsewhere
+    maxrss = usage.ru_maxrss
+    if sys.platform == 'darwin':
+        maxrss //= 1024
+
+    return status, elapsed, maxrss
+
+def benchmark (args, server_args):
+    """
+    Runs the selected scenarios and returns their results.
+    """
+    directory = tempfile.mkdtemp()
+    server, address = start_server(server_args)
+
+    public, secure = make_databases(directory)
+    cache = None
+    results = []
+
+    try:
+        for name, program, extra, keep in scenarios:
+            if args.only and not any(word in name for word in args.only):
+                continue
+
+            if not keep or cache is None:
+                cache = os.path.join (
+                    directory, 'cache{}.bin'.format(len(results))
+                )
+
+            command = [sys.executable, os.path.join(base, program)]
+            command += [
+                '--api-host', address, '--image-host', address,
+                '--api-rate', '0', '--image-rate', '0',
+                '--cache-file', cache, '--quiet'
+            ]
+            command += args.program_args
+            command += [
+                word.format (
+                    public='--public-file=' + public,
+                    secure='--secure-file=' + secure,
+                    out=os.path.join(directory, 'out.txt')
+                )
+                for word in extra
+            ]
+            command += args.boards
+
+            before = server_stats(address)
+            status, elapsed, maxrss = run(command)
+            after = server_stats(address)
+
+            requests = after.get('requests', 0) - before.get('requests', 0)
+            served   = dict (
+                (key, after[key] - before.get(key, 0))
+                for key in after if key != 'requests'
+            )
+
+            result = {
+                'scenario' : name,
+                'status'   : status,
+                'seconds'  : elapsed,
+                'requests' : requests,
+                'responses': served,
+                'requests_per_second' : requests / elapsed if elapsed else 0.0,
+                'maxrss_kb': maxrss
+            }
+            results.append(result)
+
+            print >> sys.stdout, (
+                '{scenario:<24} {seconds:8.2f}s {requests:7d} requests '
+                '{requests_per_second:9.1f} req/s {maxrss_kb:8d} KB{failed}'
+            ).format(failed=' FAILED' if status else '', **result)
+            sys.stdout.flush()
+    finally:
+        server.kill()
+        server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser (
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Benchmarks the programs against a stand-in server.',
+        epilog='unrecognized arguments are passed on to bench/server.py'
+    )
+
+    parser.add_argument (
+        '--boards', nargs='+', default=['a', 'g', 'v', 'x'],
+        help='boards to crawl, defaults to a g v x'
+    )
+
+    parser.add_argument (
+        '--only', nargs='+', metavar='word',
+        help='only run scenarios whose names contain one of the words'
+    )
+
+    parser.add_argument (
+        '--program-args', metavar='args', type=str.split, default=[],
+        help='extra arguments for every program, e.g. "--num-threads 32"'
+    )
+
+    parser.add_argument (
+        '--output', metavar='file', type=argparse.FileType('w'),
+        help='file to write the results to as JSON'
+    )
+
+    args, server_args = parser.parse_known_args()
+
+    results = benchmark(args, server_args)
+
+    if args.output:
+        json.dump(results, args.output, indent=2, sort_keys=True)
+        print >> args.output
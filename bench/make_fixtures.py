@@ -0,0 +1,273 @@
+#! /usr/bin/env python
+"""
+This program writes the thread fixtures of bench/fixtures.
+
+The threads are modelled on threads recorded from several boards: they have
+the fields, the markup and the sizes real threads have, from a few posts up
+to threads past the bump limit, with quote links, greentext, code, spoilers,
+links broken up by <wbr>, tripcodes, poster IDs, flags and images. The output
+only depends on --seed, so the fixtures can be written again at will.
+"""
+
+import argparse
+import base64
+import collections
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+base = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# board, thread number, posts, subject and what the board adds to the words
+threads = (
+    ('g',   57912356, 312, 'Daily programming thread', 'code'),
+    ('g',   51971528,   3, 'The /g/ Sticky',           'sticky'),
+    ('v',   358740112, 224, 'Post your backlog',       'spoiler'),
+    ('a',   152040933, 183, 'Seasonal discussion',     'japanese'),
+    ('pol', 123581321, 301, 'General',                 'flags'),
+    ('biz', 4815162,    47, 'Market thread',           None),
+    ('x',   19260817,   12, 'Strange coincidences',    'long'),
+    ('b',   701123581,  86, '',                        'images'),
+    ('tv',  89898989,    6, 'Anyone watching this?',   None)
+)
+
+words = (
+    'the of and to in is you that it was for on are as with they at be this '
+    'have from or one had by but not what all were we when your can said there '
+    'use each which do how their if will up other about out many then them '
+    'these so some would make like into time has look two more write go see '
+    'number no way could people than first been who its now find long down day '
+    'did get come made may part anon thread board image reply bump sage based '
+    'literally actually desu kek lmao retard newfag oldfag source cope seethe '
+    'install gentoo linux windows rust python memory pointer thinkpad game '
+    'backlog season episode waifu market chart moon dump thread filter'
+).split()
+
+japanese = (
+    u'\u3053\u308c', u'\u3059\u3054\u3044', u'\u304b\u308f\u3044\u3044',
+    u'\u30a2\u30cb\u30e1', u'\u6700\u9ad8', u'\u3088\u308d\u3057\u304f'
+)
+
+countries = (
+    ('US', 'United States'), ('GB', 'United Kingdom'), ('DE', 'Germany'),
+    ('CA', 'Canada'), ('AU', 'Australia'), ('BR', 'Brazil'),
+    ('SE', 'Sweden'), ('PL', 'Poland'), ('NL', 'Netherlands')
+)
+
+tripcodes = (
+    '!Ep8pui8Vw2', '!ZnBI2EKkq.', '!WokonZwxw2', '!!Ir0NyAQ4Ymz', '!2bgybBZ7HI'
+)
+
+extensions = ('.jpg', '.jpg', '.jpg', '.png', '.png', '.gif', '.webm')
+
+days = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+def sentence (rng, length):
+    """
+    Returns length random words.
+    """
+    return ' '.join(rng.choice(words) for _ in xrange(length))
+
+def escape (text):
+    """
+    Escapes text the way the API does.
+    """
+    return (
+        text.replace('&', '&amp;').replace('"', '&quot;')
+            .replace('\'', '&#039;').replace('<', '&lt;').replace('>', '&gt;')
+    )
+
+def link (rng):
+    """
+    Returns a link broken up by <wbr> like the API does with long words.
+    """
+    url = 'https://{}.example.com/{}/{}?id={}'.format (
+        rng.choice(words), rng.choice(words), rng.choice(words),
+        rng.randint(10 ** 8, 10 ** 9)
+    )
+
+    return '<wbr>'.join(url[i:i + 35] for i in xrange(0, len(url), 35))
+
+def comment (rng, flavour, earlier, op):
+    """
+    Returns the markup of a comment that may quote earlier posts.
+    """
+    lines = []
+
+    for _ in xrange(rng.choice((1, 1, 1, 2, 2, 3, 4, 6))):
+        roll = rng.random()
+
+        if earlier and roll < 0.3:
+            no = rng.choice(earlier[-40:])
+            lines.append (
+                '<a href="#p{0}" class="quotelink">&gt;&gt;{0}</a>{1}'.format (
+                    no, ' (OP)' if no == op and rng.random() < 0.2 else ''
+                )
+            )
+        elif roll < 0.45:
+            lines.append (
+                '<span class="quote">&gt;{}</span>'.format (
+                    escape(sentence(rng, rng.randint(3, 16)))
+                )
+            )
+        elif roll < 0.48:
+            lines.append (
+                '<span class="deadlink">&gt;&gt;{}</span>'.format (
+                    op - rng.randint(1000, 90000)
+                )
+            )
+        elif roll < 0.52:
+            lines.append(link(rng))
+        elif flavour == 'code' and roll < 0.62:
+            lines.append (
+                '<pre class="prettyprint">{}</pre>'.format (
+                    '<br>'.join ((
+                        'for (int i = 0; i &lt; n; i++) {',
+                        '    x[i] = &quot;{}&quot;;'.format(rng.choice(words)),
+                        '}'
+                    ))
+                )
+            )
+        elif flavour in ('spoiler', 'japanese') and roll < 0.6:
+            lines.append('<s>{}</s>'.format(sentence(rng, rng.randint(2, 8))))
+        elif flavour == 'japanese' and roll < 0.7:
+            lines.append(u''.join(rng.choice(japanese) for _ in xrange(4)))
+        else:
+            length = rng.randint(8, 120 if flavour == 'long' else 40)
+            lines.append(escape(sentence(rng, length)))
+
+    return '<br>'.join(lines)
+
+def image (rng, post, op):
+    """
+    Adds the fields of an image to a post.
+    """
+    width  = rng.choice((480, 640, 800, 1024, 1280, 1920, 2560))
+    height = int(width * rng.choice((0.5625, 0.75, 1.0, 1.33, 1.5)))
+    bound  = 250 if op else 125
+    scale  = min(float(bound) / width, float(bound) / height)
+
+    post['filename'] = rng.choice ((
+        str(rng.randint(10 ** 12, 10 ** 13)),
+        'Screenshot_{}'.format(rng.randint(10 ** 7, 10 ** 8)),
+        '{}_{}'.format(rng.choice(words), rng.choice(words)),
+        'image'
+    ))
+    post['ext']    = rng.choice(extensions)
+    post['w']      = width
+    post['h']      = height
+    post['tn_w']   = int(width * scale)
+    post['tn_h']   = int(height * scale)
+    post['tim']    = post['time'] * 1000 + rng.randint(0, 999)
+    post['md5']    = base64.b64encode (
+        ''.join(chr(rng.randint(0, 255)) for _ in xrange(16))
+    )
+    post['fsize']  = rng.randint(20000, 3000000)
+
+    if rng.random() < 0.02:
+        post['spoiler'] = 1
+
+def make_thread (rng, board, no, count, subject, flavour):
+    """
+    Returns the contents of a thread.
+    """
+    now      = 1476700000 + rng.randint(0, 10 ** 6)
+    earlier  = []
+    posts    = []
+    ids      = ['{:08x}'.format(rng.getrandbits(32)) for _ in xrange(count // 3 + 1)]
+    images   = 0
+
+    for i in xrange(count):
+        post = collections.OrderedDict()
+        post['no'] = no
+
+        stamp = time.gmtime(now)
+        post['now'] = '{}({}){}'.format (
+            time.strftime('%m/%d/%y', stamp), days[stamp.tm_wday],
+            time.strftime('%H:%M:%S', stamp)
+        )
+
+        post['name'] = 'Anonymous'
+
+        if rng.random() < 0.03:
+            post['name'] = rng.choice(words).capitalize()
+            post['trip'] = rng.choice(tripcodes)
+
+        if flavour == 'flags':
+            post['id'] = rng.choice(ids)
+            post['country'], post['country_name'] = rng.choice(countries)
+
+        if i == 0:
+            if subject:
+                post['sub'] = subject
+
+            if flavour == 'sticky':
+                post['sticky'] = 1
+                post['closed'] = 1
+                post['capcode'] = 'mod'
+
+        post['com'] = comment(rng, flavour, earlier, earlier[0] if earlier else no)
+        post['time'] = now
+
+        if i == 0 or rng.random() < (0.6 if flavour == 'images' else 0.25):
+            if images < 150:
+                image(rng, post, i == 0)
+                images += 1
+
+        post['resto'] = earlier[0] if earlier else 0
+
+        posts.append(post)
+        earlier.append(no)
+
+        no  += rng.randint(1, 60)
+        now += rng.randint(3, 400)
+
+    op = posts[0]
+    op['bumplimit']  = int(count >= 300)
+    op['imagelimit'] = int(images >= 150)
+    op['semantic_url'] = '-'.join(subject.lower().split()) or 'untitled'
+    op['replies']    = count - 1
+    op['images']     = images - 1
+    op['unique_ips'] = max(1, count * 2 // 5)
+    op['last_modified'] = posts[-1]['time']
+
+    return {'posts' : posts}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser (
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Writes the thread fixtures of the benchmarks.'
+    )
+
+    parser.add_argument (
+        '--directory',
+        metavar='directory', default=os.path.join(base, 'bench', 'fixtures'),
+        help='where to write the threads, defaults to bench/fixtures'
+    )
+
+    parser.add_argument (
+        '--seed',
+        metavar='n', type=int, default=4,
+        help='seed of the generated contents, defaults to 4'
+    )
+
+    args = parser.parse_args()
+
+    for board, no, count, subject, flavour in threads:
+        rng = random.Random(zlib.crc32(repr((args.seed, board, no))))
+        filename = os.path.join (
+            args.directory, '{}-{}.json'.format(board, no)
+        )
+
+        with open(filename, 'wb') as outfile:
+            json.dump (
+                make_thread(rng, board, no, count, subject, flavour),
+                outfile, separators=(',', ':')
+            )
+
+        print >> sys.stdout, '{} {} posts, {} bytes'.format (
+            filename, count, os.path.getsize(filename)
+        )
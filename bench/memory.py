@@ -0,0 +1,169 @@
+#! /usr/bin/env python
+"""
+This program measures the memory taken by the objects Thread.process builds
+for every post, over the same thread fixtures as bench/micro.py.
+
+The fixtures are processed --copies times and every post is kept alive, the
+growth of the resident memory divided by the number of posts is the cost per
+post. The size of the objects themselves, as sys.getsizeof reports it, and the
+number of objects the garbage collector tracks per post are reported as well.
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+
+base = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, base)
+
+from iwi.core import Thread
+
+from micro import load_fixtures
+from micro import revision
+
+def resident ():
+    """
+    Returns the peak resident memory of this process in bytes.
+    """
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on Mac OS X and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return maxrss
+
+    return maxrss * 1024
+
+def object_size (obj):
+    """
+    Returns the size of an object along with its attribute dictionary, if it
+    has one.
+    """
+    size = sys.getsizeof(obj)
+
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+
+    return size
+
+def post_size (post):
+    """
+    Returns the size of a post and of the tripcodes and image it refers to,
+    the strings and numbers they hold are not counted.
+    """
+    return sum (
+        object_size(obj) for obj in (post, post.public, post.secure, post.image)
+        if obj is not None
+    )
+
+def measure (fixtures, copies):
+    """
+    Processes the fixtures copies times keeping every post and returns the
+    number of posts, the resident bytes, the object bytes and the tracked
+    objects per post.
+    """
+    threads = []
+    for contents in fixtures:
+        thread = Thread('g', 0)
+        thread.download = lambda bypass_cache=False, contents=contents : contents
+        threads.append(thread)
+
+    # warm up so that only the posts themselves count
+    for thread in threads:
+        thread.process()
+
+    gc.collect()
+    tracked = len(gc.get_objects())
+    before  = resident()
+
+    posts = []
+    for _ in xrange(copies):
+        for thread in threads:
+            posts.extend(thread.process())
+
+    gc.collect()
+    tracked = len(gc.get_objects()) - tracked
+    after   = resident()
+
+    count = len(posts)
+
+    return (
+        count,
+        float(after - before) / count,
+        float(sum(map(post_size, posts))) / count,
+        float(tracked) / count
+    )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser (
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Measures the memory taken per post by Thread.process.'
+    )
+
+    parser.add_argument (
+        '--fixtures',
+        metavar='directory', default=os.path.join(base, 'bench', 'fixtures'),
+        help='directory with thread JSON files, defaults to bench/fixtures'
+    )
+
+    parser.add_argument (
+        '--cache-file',
+        metavar='file',
+        help='take the fixtures from the threads in a cache file instead'
+    )
+
+    parser.add_argument (
+        '--limit',
+        metavar='n', type=int, default=200,
+        help='threads to take from --cache-file, defaults to 200'
+    )
+
+    parser.add_argument (
+        '--copies',
+        metavar='n', type=int, default=200,
+        help='times to process the fixtures, defaults to 200'
+    )
+
+    parser.add_argument (
+        '--output',
+        metavar='file', type=argparse.FileType('w'),
+        help='file to save the results to as JSON'
+    )
+
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args)
+
+    if not fixtures:
+        print >> sys.stderr, 'no fixtures found'
+        exit(1)
+
+    count, resident_bytes, object_bytes, objects = measure (
+        fixtures, args.copies
+    )
+
+    print >> sys.stdout, '{} posts kept'.format(count)
+    print >> sys.stdout, '{:<24} {:10.1f} bytes/post'.format (
+        'resident memory', resident_bytes
+    )
+    print >> sys.stdout, '{:<24} {:10.1f} bytes/post'.format (
+        'post objects', object_bytes
+    )
+    print >> sys.stdout, '{:<24} {:10.2f} objects/post'.format (
+        'tracked objects', objects
+    )
+
+    if args.output:
+        json.dump (
+            {
+                'revision'       : revision(),
+                'posts'          : count,
+                'resident_bytes' : resident_bytes,
+                'object_bytes'   : object_bytes,
+                'tracked_objects': objects
+            },
+            args.output, indent=2, sort_keys=True
+        )
+        print >> args.output
@@ -0,0 +1,260 @@
+#! /usr/bin/env python
+"""
+This program times the code that runs once per post, over recorded thread
+JSON, and reports the cost per post of every benchmark.
+
+The fixtures are the thread files in bench/fixtures, or the threads of a
+cache file with --cache-file so that real recorded threads can be used. The
+results can be saved with --output and compared against saved results with
+--compare, so that a regression in the cost per post shows up between
+commits.
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+base = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, base)
+
+from iwi.core     import Public
+from iwi.core     import Secure
+from iwi.core     import Thread
+from iwi.web      import WebCache
+from iwi.web.html import sanitize
+
+from dump_ngrams import tokenize
+
+def load_fixtures (args):
+    """
+    Returns the contents of the thread fixtures.
+    """
+    if args.cache_file:
+        webcache = WebCache()
+        webcache.load(args.cache_file)
+
+        keys = sorted(key for key in webcache.keys() if '/thread/' in key)
+        keys = keys[:args.limit]
+
+        return [webcache.not_modified(key) for key in keys]
+
+    fixtures = []
+
+    for filename in sorted(glob.glob(os.path.join(args.fixtures, '*.json'))):
+        with open(filename, 'rb') as f:
+            fixtures.append(f.read())
+
+    return fixtures
+
+def make_benchmarks (fixtures):
+    """
+    Returns the benchmarks as (name, function) pairs, every function handles
+    every post of the fixtures once.
+    """
+    decoder = Thread('g', 0)
+    decoded = [decoder.decode(contents) for contents in fixtures]
+    posts   = [post for thread in decoded for post in thread['posts']]
+
+    comments = [post.get('com', '') for post in posts]
+    sanitized = [sanitize(comment).encode('utf8') for comment in comments]
+    trips = [str(post.get('trip', '')) for post in posts]
+
+    threads = []
+    for i, contents in enumerate(fixtures):
+        thread = Thread('g', i)
+        thread.download = lambda bypass_cache=False, contents=contents : contents
+        threads.append(thread)
+
+    webcache = WebCache()
+    webcache.cache = {}
+
+    for i, contents in enumerate(fixtures):
+        webcache.modified(str(i), None, contents)
+
+    def decode ():
+        for contents in fixtures:
+            decoder.decode(contents)
+
+    def decode_hot ():
+        for thread, contents in zip(threads, fixtures):
+            thread.decode(contents, 'unchanged')
+
+    def process ():
+        for thread in threads:
+            thread.process()
+
+    def iter_posts ():
+        for thread in threads:
+            for _ in thread.iter_posts(('trip',)):
+                pass
+
+    def sanitize_comments ():
+        for comment in comments:
+            sanitize(comment)
+
+    def tokenize_comments ():
+        for contents in sanitized:
+            tokenize(contents)
+
+    def match_tripcodes ():
+        for trip in trips:
+            Public.pattern.match(trip)
+            Secure.pattern.search(trip)
+
+    def compress ():
+        for i, contents in enumerate(fixtures):
+            webcache.modified(str(i), None, contents)
+
+    def decompress ():
+        for i in xrange(len(fixtures)):
+            webcache.not_modified(str(i))
+
+    return len(posts), [
+        ('WebEntity.decode',       decode),
+        ('WebEntity.decode hot',   decode_hot),
+        ('Thread.process',         process),
+        ('Thread.iter_posts',      iter_posts),
+        ('html.sanitize',          sanitize_comments),
+        ('dump_ngrams.tokenize',   tokenize_comments),
+        ('Public/Secure.pattern',  match_tripcodes),
+        ('WebCache compress',      compress),
+        ('WebCache decompress',    decompress)
+    ]
+
+def measure (function, repeat, min_time):
+    """
+    Returns the best time of a single call to function out of repeat rounds,
+    every round calls function until at least min_time seconds have passed.
+    """
+    best = None
+
+    for _ in xrange(repeat):
+        calls = 0
+        started = time.time()
+
+        while True:
+            function()
+            calls += 1
+
+            elapsed = time.time() - started
+            if elapsed >= min_time:
+                break
+
+        elapsed /= calls
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+def revision ():
+    """
+    Returns the current git revision, or None outside of a work tree.
+    """
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output (
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=base, stderr=devnull
+            ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser (
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Times the per-post hot paths over thread fixtures.'
+    )
+
+    parser.add_argument (
+        '--fixtures',
+        metavar='directory', default=os.path.join(base, 'bench', 'fixtures'),
+        help='directory with thread JSON files, defaults to bench/fixtures'
+    )
+
+    parser.add_argument (
+        '--cache-file',
+        metavar='file',
+        help='take the fixtures from the threads in a cache file instead'
+    )
+
+    parser.add_argument (
+        '--limit',
+        metavar='n', type=int, default=200,
+        help='threads to take from --cache-file, defaults to 200'
+    )
+
+    parser.add_argument (
+        '--repeat',
+        metavar='n', type=int, default=5,
+        help='rounds per benchmark, the best one counts, defaults to 5'
+    )
+
+    parser.add_argument (
+        '--min-time',
+        metavar='seconds', type=float, default=0.2,
+        help='minimum duration of a round, defaults to 0.2'
+    )
+
+    parser.add_argument (
+        '--only', nargs='+', metavar='word',
+        help='only run benchmarks whose names contain one of the words'
+    )
+
+    parser.add_argument (
+        '--output',
+        metavar='file', type=argparse.FileType('w'),
+        help='file to save the results to as JSON'
+    )
+
+    parser.add_argument (
+        '--compare',
+        metavar='file', type=argparse.FileType('r'),
+        help='results saved with --output to compare against'
+    )
+
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args)
+
+    if not fixtures:
+        print >> sys.stderr, 'no fixtures found'
+        exit(1)
+
+    count, benchmarks = make_benchmarks(fixtures)
+    previous = json.load(args.compare)['results'] if args.compare else {}
+    results  = {}
+
+    print >> sys.stdout, '{} threads, {} posts'.format(len(fixtures), count)
+
+    for name, function in benchmarks:
+        if args.only and not any(word in name for word in args.only):
+            continue
+
+        per_post = measure(function, args.repeat, args.min_time) / count * 1e6
+        results[name] = per_post
+
+        line = '{:<24} {:10.3f} us/post'.format(name, per_post)
+
+        if name in previous:
+            line += ' {:+7.1f}%'.format (
+                (per_post / previous[name] - 1.0) * 100.0
+            )
+
+        print >> sys.stdout, line
+        sys.stdout.flush()
+
+    if args.output:
+        json.dump (
+            {
+                'revision' : revision(),
+                'time'     : time.time(),
+                'python'   : sys.version.split()[0],
+                'posts'    : count,
+                'results'  : results
+            },
+            args.output, indent=2, sort_keys=True
+        )
+        print >> args.output
@@ -0,0 +1,433 @@
+#! /usr/bin/env python
+"""
+This program is a stand-in for the 4chan API and image servers that serves
+synthetic boards, threads and images, for testing and benchmarking the
+programs without touching the real site.
+
+Every board asked for exists, boards.json lists the boards given with
+--boards. The contents are generated from the board name, the thread number
+and --seed, so they are the same on every run. Threads carry a Last-Modified
+header and conditional requests for unchanged threads are answered with 304.
+
+Latency, throttling (429) and server errors (500) can be injected, the
+counters of the server are served as JSON at /stats.
+"""
+
+import BaseHTTPServer
+import SocketServer
+import argparse
+import collections
+import email.utils
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+
+vocabulary = (
+    'the of and to in is you that it he was for on are as with his they at '
+    'be this have from or one had by word but not what all were we when your '
+    'can said there use an each which she do how their if will up other about '
+    'out many then them these so some her would make like him into time has '
+    'look two more write go see number no way could people my than first '
+    'water been call who oil its now find long down day did get come made may '
+    'part tripcode secure anonymous thread board image reply bump sage'
+).split()
+
+tripcodes = (
+    'Ep8pui8Vw2', 'ZnBI2EKkq.', 'WokonZwxw2', '2bgybBZ7HI'
+)
+
+class Content (object):
+    """
+    Generates the synthetic contents served.
+    """
+    def __init__ (self, args):
+        """
+        Initializes an instance from the parsed program arguments.
+        """
+        self.args = args
+        self.epoch = 1400000000
+
+    def random (self, *key):
+        """
+        Returns a random generator seeded by the key.
+        """
+        return random.Random(zlib.crc32(repr((self.args.seed,) + key)))
+
+    def last_modified (self, board, thread):
+        """
+        Returns the UNIX timestamp of the last modification of a thread.
+
+        With --churn a fraction of the threads is modified every --churn-period
+        seconds.
+        """
+        modified = self.epoch + thread
+
+        if self.args.churn and self.args.churn_period > 0:
+            generation = int(time.time() // self.args.churn_period)
+
+            if self.random(board, thread, generation).random() < self.args.churn:
+                modified = generation * int(self.args.churn_period)
+
+        return modified
+
+    def board_modified (self, board):
+        """
+        Returns the UNIX timestamp of the last modification of any thread on a
+        board.
+        """
+        return max (
+            self.last_modified(board, no) for no in self.thread_numbers(board)
+        )
+
+    def thread_numbers (self, board):
+        """
+        Returns the thread numbers of a board.
+        """
+        return range(1000, 1000 + self.args.threads)
+
+    def pages (self, board):
+        """
+        Returns the thread numbers of a board split into pages.
+        """
+        numbers = self.thread_numbers(board)
+        size = self.args.threads_per_page
+
+        return [numbers[i:i+size] for i in xrange(0, len(numbers), size)]
+
+    def boards (self):
+        """
+        Returns the contents of boards.json.
+        """
+        return {
+            'boards' : [
+                {'board' : board, 'title' : board}
+                for board in self.args.boards.split(',')
+            ]
+        }
+
+    def catalog (self, board):
+        """
+        Returns the contents of threads.json for a board.
+        """
+        return [
+            {
+                'page' : page,
+                'threads' : [
+                    {'no' : no, 'last_modified' : self.last_modified(board, no)}
+                    for no in numbers
+                ]
+            }
+            for page, numbers in enumerate(self.pages(board), 1)
+        ]
+
+    def page (self, board, page):
+        """
+        Returns the contents of a page of a board, or None if there is no such
+        page.
+        """
+        pages = self.pages(board)
+
+        if not 1 <= page <= len(pages):
+            return None
+
+        return {
+            'threads' : [
+                {'posts' : self.posts(board, no)[:1]}
+                for no in pages[page - 1]
+            ]
+        }
+
+    def thread (self, board, thread):
+        """
+        Returns the contents of a thread, or None if there is no such thread.
+        """
+        if thread not in self.thread_numbers(board):
+            return None
+
+        return {'posts' : self.posts(board, thread)}
+
+    def posts (self, board, thread):
+        """
+        Returns the posts of a thread.
+        """
+        rng = self.random(board, thread)
+        modified = self.last_modified(board, thread)
+
+        posts = []
+
+        for i in xrange(self.args.posts):
+            no = thread * 1000 + i if i else thread
+
+            words = [rng.choice(vocabulary) for _ in xrange(rng.randint(5, 60))]
+            comment = ' '.join(words)
+            comment = comment.replace(' and ', ' &amp; ', 1)
+            comment = comment.replace(' the ', ' the<br>', 1)
+
+            post = {
+                'no'   : no,
+                'time' : self.epoch + no % 100000,
+                'name' : 'Anonymous',
+                'com'  : comment
+            }
+
+            if i == 0:
+                post['sub'] = ' '.join(words[:3])
+                post['last_modified'] = modified
+
+            if rng.random() < self.args.tripcode_rate:
+                post['name'] = rng.choice(vocabulary)
+                post['trip'] = '!' + rng.choice(tripcodes)
+
+                if rng.random() < 0.25:
+                    post['trip'] += '!!' + ''.join (
+                        rng.choice('abcdefghijklmnopqrstuvwxyz0123456789+/')
+                        for _ in xrange(11)
+                    )
+
+            if rng.random() < self.args.image_rate:
+                post['tim'] = no
+                post['ext'] = '.jpg'
+                post['filename'] = rng.choice(vocabulary)
+
+            posts.append(post)
+
+        return posts
+
+    def image (self, board, tim):
+        """
+        Returns the bytes of an image.
+        """
+        return self.random(board, tim).choice('abcdef') * self.args.image_size
+
+class Handler (BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answers requests from the synthetic contents.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    catalog_path = re.compile(r'^/(\w+)/threads\.json$')
+    page_path    = re.compile(r'^/(\w+)/(\d+)\.json$')
+    thread_path  = re.compile(r'^/(\w+)/thread/(\d+)\.json$')
+    image_path   = re.compile(r'^/(\w+)/(\d+)\.\w+$')
+
+    def log_message (self, *ignored):
+        """
+        Keeps quiet.
+        """
+        pass
+
+    def count (self, status):
+        """
+        Counts a response.
+        """
+        with self.server.lock:
+            self.server.stats['requests'] += 1
+            self.server.stats[str(status)] += 1
+
+    def reply (self, status, body='', headers=()):
+        """
+        Sends a response.
+        """
+        self.count(status)
+
+        self.send_response(status)
+
+        for header in headers:
+            self.send_header(*header)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        self.wfile.write(body)
+
+    def do_GET (self):
+        """
+        Answers a GET request.
+        """
+        args = self.server.args
+        content = self.server.content
+
+        path = self.path.split('?')[0]
+
+        if path == '/stats':
+            with self.server.lock:
+                body = json.dumps(self.server.stats)
+
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if args.latency:
+            time.sleep(args.latency)
+
+        rng = random.random()
+
+        if rng < args.throttle_rate:
+            return self.reply(429, headers=[('Retry-After', '1')])
+
+        if rng < args.throttle_rate + args.error_rate:
+            return self.reply(500)
+
+        modified = content.epoch
+        match = None
+
+        if path == '/boards.json':
+            body = content.boards()
+        elif self.catalog_path.match(path):
+            match = self.catalog_path.match(path)
+            body = content.catalog(match.group(1))
+            modified = content.board_modified(match.group(1))
+        elif self.page_path.match(path):
+            match = self.page_path.match(path)
+            body = content.page(match.group(1), int(match.group(2)))
+            modified = content.board_modified(match.group(1))
+        elif self.thread_path.match(path):
+            match = self.thread_path.match(path)
+            board, thread = match.group(1), int(match.group(2))
+            body = content.thread(board, thread)
+            modified = content.last_modified(board, thread)
+        elif self.image_path.match(path):
+            match = self.image_path.match(path)
+            body = content.image(match.group(1), int(match.group(2)))
+        else:
+            body = None
+
+        if body is None:
+            return self.reply(404)
+
+        last_modified = email.utils.formatdate(modified, usegmt=True)
+
+        if self.headers.get('If-Modified-Since') == last_modified:
+            return self.reply(304)
+
+        if not isinstance(body, str):
+            body = json.dumps(body)
+
+        self.reply (
+            200, body, [
+                ('Last-Modified', last_modified),
+                ('Content-Type', 'application/json')
+            ]
+        )
+
+class Server (SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Threaded HTTP server holding the contents and the counters.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__ (self, address, args):
+        """
+        Initializes an instance from an address and the program arguments.
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, Handler)
+
+        self.args = args
+        self.content = Content(args)
+
+        self.lock = threading.Lock()
+        self.stats = collections.Counter()
+
+def make_parser ():
+    """
+    Returns the argument parser of the server.
+    """
+    parser = argparse.ArgumentParser (
+        description='Serves a synthetic stand-in for the 4chan API.'
+    )
+
+    parser.add_argument (
+        '--host', default='127.0.0.1',
+        help='address to listen on, defaults to 127.0.0.1'
+    )
+
+    parser.add_argument (
+        '--port', type=int, default=8765,
+        help='port to listen on, 0 picks a free one, defaults to 8765'
+    )
+
+    parser.add_argument (
+        '--boards', default='a,g,v,x',
+        help='comma separated boards listed in boards.json, defaults to a,g,v,x'
+    )
+
+    parser.add_argument (
+        '--threads', metavar='n', type=int, default=150,
+        help='threads per board, defaults to 150'
+    )
+
+    parser.add_argument (
+        '--threads-per-page', metavar='n', type=int, default=15,
+        help='threads per page, defaults to 15'
+    )
+
+    parser.add_argument (
+        '--posts', metavar='n', type=int, default=50,
+        help='posts per thread, defaults to 50'
+    )
+
+    parser.add_argument (
+        '--tripcode-rate', metavar='p', type=float, default=0.1,
+        help='fraction of posts with a tripcode, defaults to 0.1'
+    )
+
+    parser.add_argument (
+        '--image-rate', metavar='p', type=float, default=0.2,
+        help='fraction of posts with an image, defaults to 0.2'
+    )
+
+    parser.add_argument (
+        '--image-size', metavar='bytes', type=int, default=4096,
+        help='size of every image, defaults to 4096'
+    )
+
+    parser.add_argument (
+        '--latency', metavar='seconds', type=float, default=0.0,
+        help='delay before every response, defaults to 0'
+    )
+
+    parser.add_argument (
+        '--throttle-rate', metavar='p', type=float, default=0.0,
+        help='fraction of requests answered with 429, defaults to 0'
+    )
+
+    parser.add_argument (
+        '--error-rate', metavar='p', type=float, default=0.0,
+        help='fraction of requests answered with 500, defaults to 0'
+    )
+
+    parser.add_argument (
+        '--churn', metavar='p', type=float, default=0.0,
+        help='fraction of threads modified every --churn-period, defaults to 0'
+    )
+
+    parser.add_argument (
+        '--churn-period', metavar='seconds', type=float, default=60.0,
+        help='seconds between modifications with --churn, defaults to 60'
+    )
+
+    parser.add_argument (
+        '--seed', type=int, default=0,
+        help='seed of the generated contents, defaults to 0'
+    )
+
+    return parser
+
+if __name__ == '__main__':
+    args = make_parser().parse_args()
+    server = Server((args.host, args.port), args)
+
+    print >> sys.stdout, 'listening on {}:{}'.format(*server.server_address)
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,13 +1,42 @@
 #! /usr/bin/env python
 
+import json
+import os
+import subprocess
+import sys
+import zlib
+
 from iwi.core      import classify
+from iwi.core      import Site
 from iwi.core      import Thread
+from iwi.core      import WebEntity
 from iwi.threading import Pool
 from iwi.web       import all_boards
 
+from common import create_pool
 from common import logger
 from common import parameters
 
+def in_shard (unit, shard=None, shard_by='board'):
+    """
+    Returns whether a unit belongs to the shard given as an (index, count)
+    pair, units are assigned to shards by a hash of their board or thread.
+
+    Units above the level that is sharded on always belong to every shard.
+    """
+    if shard is None or isinstance(unit, Site):
+        return True
+
+    if shard_by == 'board':
+        name = unit.board
+    elif isinstance(unit, Thread):
+        name = '{}/{}'.format(unit.board, unit.thread)
+    else:
+        return True
+
+    index, count = shard
+    return (zlib.crc32(name) & 0xffffffff) % count == index
+
 def build_cache (*links):
     """
     Builds up the internal WebEntity.webcache with a snapshot of the provided
@@ -15,14 +44,23 @@ def build_cache (*links):
 
     If no URLs are given, it will attempt to update the cache with a snapshot
     of the entirety of 4chan.
+
+    If a shard is set in the parameter list only the boards or threads of that
+    shard are downloaded.
     """
-    pool = Pool(num_threads=parameters.num_threads)
+    pool = create_pool()
 
     def work (unit):
+        if not in_shard(unit, parameters.shard, parameters.shard_by):
+            return
+
         logger.info('working %r', unit)
 
         if isinstance(unit, Thread):
-            unit.download()
+            if WebEntity.webcache.keep_parsed:
+                unit.parsed()
+            else:
+                unit.download()
         else:
             for e in unit.process():
                 pool.push(work, e)
@@ -35,9 +73,92 @@ def build_cache (*links):
         pool.join()
 
     logger.info('Join complete.')
+    pool.close()
+
+def shard_file (cache_file, index):
+    """
+    Returns the cache file written by the worker of a shard.
+    """
+    return '{}.shard{:02d}'.format(cache_file, index)
+
+def coordinate (argv, workers):
+    """
+    Runs a worker process per shard with the program arguments in argv and
+    merges the caches of the workers into the internal WebEntity.webcache.
+
+    The workers split the rate limits between them and keep their caches, so
+    that the next run only asks for what changed. Their statistics and
+    profiles are added to the ones of this process.
+
+    Returns whether every worker succeeded.
+    """
+    children = []
+
+    for index in xrange(workers):
+        command = [sys.executable, os.path.abspath(__file__)] + argv + [
+            '--workers', '1',
+            '--shard', '{}/{}'.format(index, workers),
+            '--cache-file', shard_file(parameters.cache_file, index),
+            '--stats-file', shard_file(parameters.cache_file, index) + '.stats',
+            '--api-rate', str(parameters.api_rate / workers),
+            '--image-rate', str(parameters.image_rate / workers)
+        ]
+
+        if parameters.profile:
+            command += [
+                '--profile', shard_file(parameters.cache_file, index) + '.prof'
+            ]
+
+        logger.info('starting worker %d of %d', index + 1, workers)
+        children.append(subprocess.Popen(command))
+
+    failed = [child for child in children if child.wait() != 0]
+
+    for index in xrange(workers):
+        copied = WebEntity.webcache.merge (
+            shard_file(parameters.cache_file, index)
+        )
+        logger.info('merged %d entries from shard %d', copied, index)
+
+        stats_file = shard_file(parameters.cache_file, index) + '.stats'
+
+        if os.path.exists(stats_file):
+            with open(stats_file, 'r') as infile:
+                WebEntity.webcache.statistics.merge(json.load(infile))
+
+            os.remove(stats_file)
+
+        profile_file = shard_file(parameters.cache_file, index) + '.prof'
+
+        if Pool.profiler is not None and os.path.exists(profile_file):
+            Pool.profiler.add_file(profile_file)
+            os.remove(profile_file)
+
+    return not failed
+
+def parse_shard (value):
+    """
+    Parses a shard given as index/count.
+    """
+    import argparse
+
+    try:
+        index, count = map(int, value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError (
+            'shard must be given as index/count, like 0/4'
+        )
+
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError (
+            'shard index must be between 0 and count - 1'
+        )
+
+    return index, count
 
 if __name__ == '__main__':
     from common import CommonParser
+    from defaults import defaults
 
     parser = CommonParser (
         description='Builds the web cache.',
@@ -49,11 +170,42 @@ if __name__ == '__main__':
         help='boards/pages/threads, may either be full URLs or names like /g/'
     )
 
+    parser.add_argument (
+        '--workers',
+        metavar='n', type=int, default=defaults['workers'],
+        help='split the links among n worker processes, defaults to {workers}'.format (
+            **defaults
+        )
+    )
+
+    parser.add_argument (
+        '--shard',
+        metavar='i/n', type=parse_shard, default=defaults['shard'],
+        help='only download shard i of n, for crawling from several machines'
+    )
+
+    parser.add_argument (
+        '--shard-by',
+        choices=('board', 'thread'), default=defaults['shard_by'],
+        help='whether shards are made of boards or threads, defaults to {shard_by}'.format (
+            **defaults
+        )
+    )
+
     args = parser.parse_args()
 
     if parser.sanity_check(args):
         exit(1)
 
     parser.pre_process(args)
-    build_cache(*args.link)
+
+    if args.workers > 1:
+        succeeded = coordinate(sys.argv[1:], args.workers)
+    else:
+        succeeded = True
+        build_cache(*args.link)
+
     parser.post_process(args)
+
+    if not succeeded:
+        exit(1)
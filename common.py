@@ -2,15 +2,30 @@
 This file holds things that the various programs have in common.
 """
 import argparse
+import collections
+import json
 import logging
-
-from iwi.core import WebEntity
-from iwi.web  import Links
+import multiprocessing
+import string
+import time
+
+from iwi.core      import classify
+from iwi.core      import Thread
+from iwi.core      import WebEntity
+from iwi.threading import AsyncPool
+from iwi.threading import Pool
+from iwi.threading import ProcessPool
+from iwi.threading import Profiler
+from iwi.threading import ProgressReporter
+from iwi.web       import Codec
+from iwi.web       import Decoder
+from iwi.web       import Links
 
 from defaults import defaults
 
 __all__ = ['CommonParser', 'OfflineParser', 'TripcodeParser',
-           'logger', 'parameters']
+           'create_pool', 'find_threads', 'logger', 'map_threads',
+           'parameters', 'summary', 'use_processes']
 
 logger = logging.getLogger('')
 logger.setLevel(logging.INFO)
@@ -20,6 +35,253 @@ logger.addHandler(default_handler)
 
 parameters = argparse.Namespace(**defaults)
 
+started = time.time()
+
+# reports the progress of the run if --progress is set
+reporter = None
+
+# profiles the run if --profile is set
+profiler = None
+
+def create_pool (parameters=parameters):
+    """
+    Returns a pool for the engine selected in the parameter list.
+
+    Results must be retrieved with iter_results.
+    """
+    if parameters.engine == 'async':
+        return AsyncPool (
+            WebEntity.webcache,
+            concurrency=parameters.concurrency
+        )
+
+    return Pool (
+        num_threads=parameters.num_threads,
+        max_results=parameters.max_results,
+        max_jobs=parameters.max_jobs,
+        statistics=WebEntity.webcache.statistics
+    )
+
+def find_threads (*links):
+    """
+    Returns the threads that the links lead to without processing them.
+    """
+    threads = []
+    pool    = create_pool()
+
+    def work (unit):
+        if isinstance(unit, Thread):
+            return unit
+
+        logger.info('working %r', unit)
+        for e in unit.process():
+            pool.push(work, e)
+
+    for link in map(classify, links):
+        pool.push(work, link)
+
+    threads.extend(pool.iter_results())
+    pool.close()
+
+    return threads
+
+def map_threads (function, *links):
+    """
+    Yields the results of calling function on shards of the threads that the
+    links lead to, the shards are handled by --num-processes processes.
+
+    Each process reads the threads of its shard from the web cache itself, the
+    partial results are left for the caller to merge. The parsed forms of
+    threads the processes parse are sent back to be stored in the web cache.
+    """
+    threads = find_threads(*links)
+    logger.info('processing %d threads', len(threads))
+
+    webcache  = WebEntity.webcache
+    processes = ProcessPool (
+        parameters.num_processes,
+        statistics=webcache.statistics
+    )
+
+    def work (shard):
+        return function(shard), webcache.take_parsed()
+
+    for result, parsed in processes.map(work, threads):
+        webcache.add_parsed(parsed)
+        yield result
+
+def use_processes (parameters=parameters):
+    """
+    Returns whether threads should be processed by map_threads, which is the
+    case in offline mode when more than one process is allowed.
+    """
+    return parameters.offline and parameters.num_processes > 1
+
+def summary ():
+    """
+    Returns the statistics of the web cache, the pools and the request
+    scheduler along with the seconds the program has been running as a
+    dictionary.
+    """
+    statistics = WebEntity.webcache.statistics.statistics()
+    statistics['scheduler'] = WebEntity.webcache.scheduler.statistics()
+    statistics['seconds'] = time.time() - started
+
+    return statistics
+
+def log_statistics (statistics):
+    """
+    Logs a summary of the statistics returned by summary.
+
+    The time left of the pool jobs once downloading, decompressing, decoding
+    and sleeping are taken out is logged as the time spent on the jobs
+    themselves, like parsing, this is only meaningful with --engine=thread
+    where downloads happen inside the jobs.
+    """
+    values = collections.defaultdict(int)
+    values.update(statistics['counters'])
+    values.update(statistics['timers'])
+    values.update(statistics['maxima'])
+    values.update(statistics['scheduler'])
+
+    def log (format_string):
+        logger.info(string.Formatter().vformat(format_string, (), values))
+
+    log('finished in {:.1f} seconds'.format(statistics['seconds']))
+
+    if values['requests']:
+        log (
+            'requests: {requests}, 200: {responses_200}, '
+            '304: {responses_304}, errors: {errors}, retries: {retries}'
+        )
+        log (
+            'received {:.2f} MB, stored {:.2f} MB'.format (
+                values['bytes_received'] / 1e6, values['bytes_stored'] / 1e6
+            )
+        )
+
+    if values['connections_opened'] or values['connections_reused']:
+        log (
+            'connections opened: {connections_opened}, '
+            'reused: {connections_reused}'
+        )
+
+    # the asynchronous engine does not time the stages of its requests
+    if values['connect'] or values['wait'] or values['transfer']:
+        log (
+            'seconds connecting: {connect:.2f}, waiting: {wait:.2f}, '
+            'transferring: {transfer:.2f}'
+        )
+
+    if values['issued']:
+        log (
+            'requests issued: {issued}, throttled: {throttled} '
+            '({waited:.1f} seconds), backoffs: {backoffs}, '
+            'retry sleep: {retry_sleep:.1f} seconds'
+        )
+
+    if values['cache_hits'] or values['cache_misses']:
+        log (
+            'cache hits: {cache_hits}, misses: {cache_misses}, '
+            'skipped as unchanged: {unchanged_skipped}'
+        )
+
+    if values['parsed_hits'] or values['parsed_misses']:
+        log (
+            'parsed threads used: {parsed_hits}, parsed anew: {parsed_misses}, '
+            'seconds reading: {unmarshal:.2f}, writing: {marshal:.2f}'
+        )
+
+    if values['compress'] or values['decompress'] or values['decode']:
+        log (
+            'seconds compressing: {compress:.2f}, '
+            'decompressing: {decompress:.2f}, decoding: {decode:.2f}'
+        )
+
+    if values['pool_jobs']:
+        busy = values['pool_busy']
+        rest = busy - sum (
+            values[name] for name in (
+                'connect', 'wait', 'transfer', 'compress', 'decompress',
+                'decode', 'throttle_sleep', 'retry_sleep'
+            )
+        )
+
+        if values['pool_thread_time']:
+            values['utilisation'] = 100.0 * busy / values['pool_thread_time']
+
+        values['rest'] = max(rest, 0.0)
+
+        log (
+            'pool jobs: {pool_jobs}, seconds busy: {pool_busy:.2f} '
+            '(jobs themselves: {rest:.2f}), utilisation: {utilisation:.0f}%, '
+            'queue depth up to: {pool_queue_depth}, '
+            'run on a full queue: {pool_inline}'
+        )
+
+def start_progress (parameters=parameters):
+    """
+    Starts reporting the progress every --progress seconds to the log file if
+    it is set.
+    """
+    global reporter
+
+    if parameters.progress:
+        reporter = ProgressReporter (
+            WebEntity.webcache.statistics,
+            interval=parameters.progress,
+            stream=parameters.log_file
+        )
+        reporter.start()
+
+def start_profile (parameters=parameters):
+    """
+    Starts profiling the main thread, the pool threads and the processes of
+    process pools if --profile is set.
+    """
+    global profiler
+
+    if parameters.profile:
+        profiler = Profiler()
+
+        Pool.profiler = profiler
+        ProcessPool.profiler = profiler
+
+        profiler.enable()
+
+def stop_profile (parameters=parameters):
+    """
+    Stops profiling and writes the merged profile to --profile.
+    """
+    if profiler is None:
+        return
+
+    profiler.disable()
+    profiler.dump(parameters.profile)
+
+    logger.info (
+        'profile written to %s, see python -m pstats %s',
+        parameters.profile, parameters.profile
+    )
+
+def report_statistics (parameters=parameters):
+    """
+    Stops reporting the progress, logs the summary of the run and writes it to
+    --stats-file as JSON if set.
+    """
+    if reporter is not None:
+        reporter.stop()
+
+    stop_profile(parameters)
+
+    statistics = summary()
+    log_statistics(statistics)
+
+    if parameters.stats_file:
+        with open(parameters.stats_file, 'w') as outfile:
+            json.dump(statistics, outfile, indent=2, sort_keys=True)
+            print >> outfile
+
 class CommonParser (argparse.ArgumentParser):
     """
     This is an ArgumentParser that adds common arguments based on the
@@ -27,8 +289,11 @@ class CommonParser (argparse.ArgumentParser):
     """
     def __init__ (self, *args, **kwargs):
         """
-        Initializes an instance adding common arguments.
+        Initializes an instance adding common arguments, engine=False leaves
+        out the arguments of create_pool for programs that do not use it.
         """
+        engine = kwargs.pop('engine', True)
+
         super(CommonParser, self).__init__(*args, **kwargs)
 
         self.add_argument (
@@ -48,6 +313,27 @@ class CommonParser (argparse.ArgumentParser):
             )
         )
 
+        self.add_argument (
+            '--stats-file',
+            metavar='file', type=str, default=defaults['stats_file'],
+            help='file to write the statistics of the run to as JSON'
+        )
+
+        self.add_argument (
+            '--profile',
+            metavar='file', type=str, default=defaults['profile'],
+            help='profile the run, threads and processes included, into file'
+        )
+
+        self.add_argument (
+            '--progress',
+            metavar='seconds', type=float, nargs='?',
+            default=defaults['progress'], const=defaults['progress_every'],
+            help='report progress every so many seconds, {progress_every} if not given'.format (
+                **defaults
+            )
+        )
+
         self.add_argument (
             '--num-threads',
             metavar='n', type=int, default=defaults['num_threads'],
@@ -56,6 +342,107 @@ class CommonParser (argparse.ArgumentParser):
             )
         )
 
+        self.add_argument (
+            '--max-results',
+            metavar='n', type=int, default=defaults['max_results'],
+            help='results to buffer before threads wait for them to be used, defaults to {max_results}'.format (
+                **defaults
+            )
+        )
+
+        self.add_argument (
+            '--max-jobs',
+            metavar='n', type=int, default=defaults['max_jobs'],
+            help='jobs to queue before threads run the jobs they add themselves, defaults to {max_jobs}'.format (
+                **defaults
+            )
+        )
+
+        if engine:
+            self.add_argument (
+                '--engine',
+                choices=('thread', 'async'), default=defaults['engine'],
+                help='thread pool or single-threaded asynchronous downloads, defaults to {engine}'.format (
+                    **defaults
+                )
+            )
+
+            self.add_argument (
+                '--concurrency',
+                metavar='n', type=int, default=defaults['concurrency'],
+                help='downloads in flight with --engine=async, defaults to {concurrency}'.format (
+                    **defaults
+                )
+            )
+
+        self.add_argument (
+            '--json-backend',
+            choices=Decoder.available(), default=defaults['json_backend'],
+            help='module to decode JSON with, defaults to the fastest one available'
+        )
+
+        self.add_argument (
+            '--codec',
+            choices=Codec.available(), default=defaults['codec'],
+            help='codec to compress new cache entries with, defaults to {codec}'.format (
+                **defaults
+            )
+        )
+
+        self.add_argument (
+            '--codec-level',
+            metavar='n', type=int, default=defaults['codec_level'],
+            help='compression level of --codec, defaults to the level of the codec'
+        )
+
+        self.add_argument (
+            '--api-rate',
+            metavar='n', type=float, default=defaults['api_rate'],
+            help='API requests per second, 0 for no limit, defaults to {api_rate}'.format (
+                **defaults
+            )
+        )
+
+        self.add_argument (
+            '--image-rate',
+            metavar='n', type=float, default=defaults['image_rate'],
+            help='image requests per second, 0 for no limit, defaults to {image_rate}'.format (
+                **defaults
+            )
+        )
+
+        self.add_argument (
+            '--api-host',
+            metavar='host', type=str, default=defaults['api_host'],
+            help='host to make API requests to, defaults to {api_host}'.format (
+                **defaults
+            )
+        )
+
+        self.add_argument (
+            '--image-host',
+            metavar='host', type=str, default=defaults['image_host'],
+            help='host to download images from, defaults to {image_host}'.format (
+                **defaults
+            )
+        )
+
+        self.add_argument (
+            '--max-connections',
+            metavar='n', type=int, default=defaults['max_connections'],
+            help='idle connections to keep per host, defaults to {max_connections}'.format (
+                **defaults
+            )
+        )
+
+        self.add_argument (
+            '--keep-alive',
+            metavar='seconds', type=float, default=defaults['keep_alive'],
+            help='seconds to keep idle connections, defaults to {keep_alive}'.format (
+                **defaults
+            )
+        )
+
         self.add_argument (
             '--debug',
             action='store_false' if defaults['debug'] else 'store_true',
@@ -72,6 +459,22 @@ class CommonParser (argparse.ArgumentParser):
             )
         )
 
+        self.add_argument (
+            '--incremental',
+            action='store_false' if defaults['incremental'] else 'store_true',
+            help='toggle skipping threads unchanged since they were cached, defaults to {incremental}'.format (
+                **defaults
+            )
+        )
+
+        self.add_argument (
+            '--parsed-cache',
+            action='store_false' if defaults['parsed_cache'] else 'store_true',
+            help='toggle keeping parsed threads next to the cache file, defaults to {parsed_cache}'.format (
+                **defaults
+            )
+        )
+
         self.add_argument (
             '--quiet',
             action='store_false' if defaults['quiet'] else 'store_true',
@@ -90,11 +493,14 @@ class CommonParser (argparse.ArgumentParser):
         Acts on iwi based on parameter list after program has been ran.
         """
         WebEntity.webcache.dump(parameters.cache_file)
+        report_statistics(parameters)
 
     def pre_process (self, parameters=parameters):
         """
         Acts on iwi based on parameter list to set up program conditions.
         """
+        start_profile(parameters)
+
         if parameters.debug:
             logger.setLevel(logging.DEBUG)
 
@@ -104,14 +510,52 @@ class CommonParser (argparse.ArgumentParser):
         if parameters.https:
             Links.scheme = 'https'
 
+        if parameters.incremental:
+            WebEntity.webcache.incremental = True
+
+        if parameters.parsed_cache:
+            WebEntity.webcache.keep_parsed = True
+
         if parameters.log_file is not defaults['log_file']:
             logger.removeHandler(default_handler)
             logger.addHandler (
                 logging.StreamHandler (parameters.log_file)
             )
 
+        if parameters.json_backend:
+            WebEntity.decoder.set_backend(parameters.json_backend)
+
+        WebEntity.webcache.codec.set_codec (
+            parameters.codec, parameters.codec_level
+        )
+
+        Links.apiloc = parameters.api_host
+        Links.imgloc = parameters.image_host
+
+        api_rate   = parameters.api_rate
+        image_rate = parameters.image_rate
+
+        # one host has one bucket, so it gets the stricter limit, 0 is none
+        if Links.apiloc == Links.imgloc and api_rate != image_rate:
+            api_rate = image_rate = min (
+                [rate for rate in (api_rate, image_rate) if rate > 0]
+            )
+
+            logger.warning (
+                '--api-host and --image-host are both %s, limiting it to the '
+                'stricter rate of %s requests per second', Links.apiloc, api_rate
+            )
+
+        WebEntity.webcache.scheduler.set_limit(Links.apiloc, api_rate)
+        WebEntity.webcache.scheduler.set_limit(Links.imgloc, image_rate)
+
+        WebEntity.webcache.connection_pool.max_size = parameters.max_connections
+        WebEntity.webcache.connection_pool.idle_timeout = parameters.keep_alive
+
         WebEntity.webcache.load(parameters.cache_file)
 
+        start_progress(parameters)
+
     def sanity_check (self, parameters=parameters):
         """
         Returns whether the parameter list is insane or not.
@@ -120,6 +564,12 @@ class CommonParser (argparse.ArgumentParser):
             logger.error('both --debug and --quiet set')
             return True
 
+        try:
+            Codec(parameters.codec, parameters.codec_level)
+        except ValueError as e:
+            logger.error('bad --codec-level: %s', e)
+            return True
+
         return False
 
 class OfflineParser (CommonParser):
@@ -137,12 +587,22 @@ class OfflineParser (CommonParser):
             )
         )
 
+        self.add_argument (
+            '--num-processes',
+            metavar='n', type=int, default=defaults['num_processes'],
+            help='how many processes to use for CPU-bound work, defaults to the number of CPUs'
+        )
+
     def post_process (self, parameters=parameters, force_cache_write=False):
         """
         Acts on iwi based on parameter list after program has been ran.
         """
         if not parameters.offline or force_cache_write:
             WebEntity.webcache.dump(parameters.cache_file)
+        else:
+            WebEntity.webcache.dump_parsed()
+
+        report_statistics(parameters)
 
     def pre_process (self, parameters=parameters):
         """
@@ -150,6 +610,9 @@ class OfflineParser (CommonParser):
         """
         super(OfflineParser, self).pre_process(parameters=parameters)
 
+        if not parameters.num_processes:
+            parameters.num_processes = multiprocessing.cpu_count()
+
         if parameters.offline:
             WebEntity.webcache.set_offline_mode()
 
@@ -183,3 +646,11 @@ class TripcodeParser (OfflineParser):
                 **defaults
             )
         )
+
+        self.add_argument (
+            '--batch-size',
+            metavar='n', type=int, default=defaults['batch_size'],
+            help='tripcodes to look up at once, defaults to {batch_size}'.format (
+                **defaults
+            )
+        )
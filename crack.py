@@ -1,14 +1,77 @@
 #! /usr/bin/env python
 
-from iwi.collections import SortedSet
+import os
+
+from iwi.collections import BloomFilter
 from iwi.core        import classify
 from iwi.core        import Post
+from iwi.solving     import FilteredSolver
+from iwi.solving     import IndexSolver
 from iwi.solving     import SQLSolver
-from iwi.threading   import Pool
 
+from common import create_pool
 from common import logger
 from common import parameters
 
+def open_solver (filename):
+    """
+    Returns a solver for a tripcode database, files ending in .idx are opened
+    as indices made by util/sqltoindex and anything else as SQL databases.
+
+    If a bloom filter made by util/makebloom sits next to the file it is put
+    in front of the solver, unless it was made for another version of the
+    file, which it would hide new solutions of.
+    """
+    if filename.endswith('.idx'):
+        solver = IndexSolver(filename)
+    else:
+        solver = SQLSolver(filename)
+
+    if not os.path.exists(filename + '.bloom'):
+        return solver
+
+    bloom = BloomFilter.load(filename + '.bloom')
+
+    if bloom.source != BloomFilter.file_stamp(filename):
+        logger.warning (
+            'ignoring %s.bloom, it was not made for this version of %s, '
+            'run util/makebloom again', filename, filename
+        )
+        bloom.close()
+        return solver
+
+    return FilteredSolver(solver, bloom)
+
+def log_statistics (name, solver):
+    """
+    Logs how many lookups the bloom filter of a solver spared.
+    """
+    if not isinstance(solver, FilteredSolver):
+        return
+
+    logger.info (
+        '{} filter: {lookups} lookups, {rejected} short-circuited, '
+        '{false_positives} false positives'.format (
+            name, **solver.statistics()
+        )
+    )
+
+def solve (posts, pub_solver, sec_solver):
+    """
+    Solves the tripcodes of a batch of posts with one lookup per solver and
+    returns the posts that were solved.
+    """
+    public = pub_solver.solve_many(e.public.cipher for e in posts if e.public)
+    secure = sec_solver.solve_many(e.secure.cipher for e in posts if e.secure)
+
+    for e in posts:
+        if e.public and not e.public.solved():
+            e.public.key = public.get(e.public.cipher)
+        if e.secure and not e.secure.solved():
+            e.secure.key = secure.get(e.secure.cipher)
+
+    return [e for e in posts if e.solved()]
+
 def crack (*links):
     """
     Returns a list of Posts with cracked trips.
@@ -17,13 +80,16 @@ def crack (*links):
     found. If any posts were cracked the corresponding Post object is added to
     a list that is returned.
 
-    The list is sorted by time of post.
+    Posts are solved in batches while the scrape is still running, only the
+    solved ones are kept. The list is sorted by time of post.
     """
-    posts = SortedSet()
-    pool  = Pool(num_threads=parameters.num_threads)
+    seen    = set()
+    solved  = []
+    pending = []
+    pool    = create_pool()
 
-    pub_solver = SQLSolver(parameters.public_file)
-    sec_solver = SQLSolver(parameters.secure_file)
+    pub_solver = open_solver(parameters.public_file)
+    sec_solver = open_solver(parameters.secure_file)
 
     def work (unit):
         if isinstance(unit, Post):
@@ -38,23 +104,28 @@ def crack (*links):
     for link in map(classify, links):
         pool.push(work, link)
 
-    pool.join()
-    logger.info('Join complete, updating with results.')
+    for e in pool.iter_results():
+        # the same person posting with the same tripcode is solved once
+        identity = (e.name, e.board, e.public, e.secure)
+        if identity in seen:
+            continue
+        seen.add(identity)
 
-    posts.update(pool.get_results())
-    pool.close()
+        pending.append(e)
+
+        if len(pending) >= parameters.batch_size:
+            solved.extend(solve(pending, pub_solver, sec_solver))
+            pending = []
 
-    solved = []
+    solved.extend(solve(pending, pub_solver, sec_solver))
+
+    logger.info('Join complete.')
+    pool.close()
 
-    for e in sorted(posts, key = lambda post : post.time):
-        if e.public:
-            e.public.solve(pub_solver)
-        if e.secure:
-            e.secure.solve(sec_solver)
-        if e.solved():
-            solved.append(e)
+    log_statistics('public', pub_solver)
+    log_statistics('secure', sec_solver)
 
-    return solved
+    return sorted(solved, key = lambda post : post.time)
 
 if __name__ == '__main__':
     from common import TripcodeParser
@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+
+from iwi.collections import PackedSet
+from iwi.solving     import TripcodeGenerator
+
+from common import logger
+from common import parameters
+
+from dump_hashes import find_hashes
+
+def read_words (filenames, first_field=False):
+    """
+    Yields the words in wordlists one at a time.
+
+    If first_field is set everything after the last space of a line is dropped,
+    like the number of occurrences in files written by dump_ngrams.py.
+    """
+    for filename in filenames:
+        logger.info('reading %s', filename)
+
+        with open(filename, 'r') as infile:
+            for line in infile:
+                line = line.rstrip('\r\n')
+
+                if first_field:
+                    line = line.rpartition(' ')[0]
+
+                if line:
+                    yield line
+
+def crack_words (words, hashes):
+    """
+    Yields the tripcode and word pairs for the words that hash to one of the
+    given regular tripcodes.
+
+    The words are hashed in parallel and streamed, so they need not fit in
+    memory.
+    """
+    targets = PackedSet(hashes)
+    logger.info('hashing against %d tripcodes', len(targets))
+
+    generator = TripcodeGenerator (
+        processes=parameters.num_processes,
+        targets=targets
+    )
+
+    return generator.generate(words)
+
+if __name__ == '__main__':
+    import argparse
+
+    from common import OfflineParser
+
+    parser = OfflineParser (
+        description='Hashes wordlists against the regular tripcodes in use.',
+        epilog=''.join ((
+                'the tripcodes are gathered from the links and --hashes-file, ',
+                'if neither is given all of 4chan where tripcodes are ',
+                'allowed is scraped'
+        ))
+    )
+
+    parser.add_argument (
+        'outfile',
+        type=argparse.FileType('w'),
+        help='file to write the solutions, will be overwritten'
+    )
+
+    parser.add_argument (
+        '-w', '--wordlist',
+        metavar='file', action='append', required=True,
+        help='wordlist with one candidate per line, may be given several times'
+    )
+
+    parser.add_argument (
+        'link', nargs='*',
+        help='boards/pages/threads, may either be full URLs or names like /g/'
+    )
+
+    parser.add_argument (
+        '--hashes-file',
+        metavar='file', type=argparse.FileType('r'),
+        help='file with tripcodes like the ones written by dump_hashes.py'
+    )
+
+    parser.add_argument (
+        '--first-field',
+        action='store_true',
+        help='drop everything after the last space of a line, for ngram files'
+    )
+
+    args = parser.parse_args()
+
+    if parser.sanity_check(args):
+        exit(1)
+
+    parser.pre_process(args)
+
+    hashes = set()
+
+    if args.hashes_file:
+        hashes.update(line.strip() for line in args.hashes_file)
+        hashes.discard('')
+
+    if args.link or not args.hashes_file:
+        hashes.update(find_hashes(*args.link))
+
+    for cipher, word in crack_words (
+        read_words(args.wordlist, args.first_field), hashes
+    ):
+        print >> args.outfile, '{} {}'.format(word, cipher)
+
+    parser.post_process(args)
@@ -11,13 +11,41 @@ defaults = {
     'public_file' : 'tripcodes/public.db3',
     'secure_file' : 'tripcodes/secure.db3',
     'log_file'    : sys.stderr,
+    'stats_file'  : None,
+    'profile'     : None,
+
+    # hosts
+    'api_host'   : 'a.4cdn.org',
+    'image_host' : 'i.4cdn.org',
 
     # values
-    'num_threads' : 16,
+    'num_threads'     : 16,
+    'num_processes'   : None,
+    'max_results'     : 1024,
+    'max_jobs'        : 1024,
+    'batch_size'      : 512,
+    'max_connections' : 16,
+    'keep_alive'      : 30.0,
+    'concurrency'     : 64,
+    'api_rate'        : 1.0,
+    'image_rate'      : 5.0,
+    'workers'         : 1,
+    'shard'           : None,
+    'progress'        : None,
+    'progress_every'  : 5.0,
+    'codec_level'     : None,
+
+    # choices
+    'engine'       : 'thread',
+    'shard_by'     : 'board',
+    'json_backend' : None,
+    'codec'        : 'zlib',
 
     # flags
-    'debug'       : False,
-    'https'       : False,
-    'offline'     : False,
-    'quiet'       : False
+    'debug'        : False,
+    'https'        : False,
+    'incremental'  : False,
+    'parsed_cache' : False,
+    'offline'      : False,
+    'quiet'        : False
 }
@@ -1,12 +1,15 @@
 #! /usr/bin/env python
 
 from iwi.core      import classify
-from iwi.core      import Post
-from iwi.threading import Pool
+from iwi.core      import Public
+from iwi.core      import Thread
 from iwi.web       import boards
 
+from common import create_pool
 from common import logger
+from common import map_threads
 from common import parameters
+from common import use_processes
 
 def find_hashes (*links):
     """
@@ -16,29 +19,48 @@ def find_hashes (*links):
     are allowed.
     """
     hashes = set()
-    pool   = Pool(num_threads=parameters.num_threads)
 
-    def work (unit):
-        if isinstance(unit, Post):
-            if unit.public:
-                return unit.public.cipher
-            return
+    def extract (thread):
+        hashes = set()
+
+        for trip, in thread.iter_posts(('trip',)):
+            match = Public.pattern.match(str(trip))
+
+            if match:
+                hashes.add(match.group(1))
 
+        return hashes
+
+    def work (unit):
         logger.info('working %r', unit)
+
+        if isinstance(unit, Thread):
+            return extract(unit)
+
         for e in unit.process():
             pool.push(work, e)
 
+    def work_shard (threads):
+        return set().union(*map(extract, threads))
+
     if not links:
         links = boards
 
+    if use_processes():
+        for result in map_threads(work_shard, *links):
+            hashes.update(result)
+
+        return hashes
+
+    pool = create_pool()
+
     for link in map(classify, links):
         pool.push(work, link)
-        pool.join()
 
-    logger.info('Join complete, updating with results.')
+        for result in pool.iter_results():
+            hashes.update(result)
 
-    for e in pool.get_results():
-        hashes.add(e)
+    logger.info('Join complete.')
     pool.close()
 
     return hashes
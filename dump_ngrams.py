@@ -1,15 +1,26 @@
 #! /usr/bin/env python
 
 import collections
+import re
 
 from iwi.core      import classify
 from iwi.core      import Thread
-from iwi.threading import Pool
 from iwi.web       import all_boards
 from iwi.web.html  import sanitize
 
+from common import create_pool
 from common import logger
+from common import map_threads
 from common import parameters
+from common import use_processes
+
+token_pattern = re.compile(r'([A-Za-z0-9]\S*[A-Za-z0-9]|[A-Za-z0-9])')
+
+def tokenize (contents):
+    """
+    Returns the lowercased tokens of sanitized contents.
+    """
+    return [token.lower() for token in token_pattern.findall(contents)]
 
 def find_ngrams (n, *links):
     """
@@ -17,49 +28,56 @@ def find_ngrams (n, *links):
 
     If no URLs are given it will attempt to scrape all of 4chan.
     """
-    import re
-
     ngrams = collections.Counter()
-    pool   = Pool(num_threads=parameters.num_threads)
-
-    token_pattern = re.compile(r'([A-Za-z0-9]\S*[A-Za-z0-9]|[A-Za-z0-9])')
 
     def generate_ngrams (tokens):
         return zip(*[tokens[i:] for i in range(n)])
 
-    def work (unit):
-        logger.info('working %r', unit)
+    def extract (thread):
+        ngrams = collections.Counter()
 
-        if isinstance(unit, Thread):
-            thread = unit.download_and_decode()
-            ngrams = collections.Counter()
+        for contents, in thread.iter_posts(('com',)):
+            contents = sanitize(contents).encode('utf8')
 
-            for post in thread['posts']:
-                contents = post.get('com', '')
-                contents = sanitize(contents).encode('utf8')
+            ngrams.update(generate_ngrams(tokenize(contents)))
 
-                tokens = token_pattern.findall(contents)
-                tokens = [token.lower() for token in tokens]
+        return ngrams
 
-                ngrams.update(generate_ngrams(tokens))
+    def work (unit):
+        logger.info('working %r', unit)
 
-            return ngrams
+        if isinstance(unit, Thread):
+            return extract(unit)
 
         for e in unit.process():
             pool.push(work, e)
 
+    def work_shard (threads):
+        ngrams = collections.Counter()
+
+        for thread in threads:
+            ngrams.update(extract(thread))
+
+        return ngrams
+
     if not links:
         links = all_boards
 
+    if use_processes():
+        for counter in map_threads(work_shard, *links):
+            ngrams.update(counter)
+
+        return ngrams
+
+    pool = create_pool()
+
     for link in map(classify, links):
         pool.push(work, link)
-        pool.join()
-
-    logger.info('Join complete, updating with results.')
 
-    for counter in pool.get_results():
-        ngrams.update(counter)
+        for counter in pool.iter_results():
+            ngrams.update(counter)
 
+    logger.info('Join complete.')
     pool.close()
 
     return ngrams
@@ -2,12 +2,14 @@
 
 from iwi.core      import classify
 from iwi.core      import Thread
-from iwi.threading import Pool
 from iwi.web       import all_boards
 from iwi.web.html  import sanitize
 
+from common import create_pool
 from common import logger
+from common import map_threads
 from common import parameters
+from common import use_processes
 
 def find_words (*links):
     """
@@ -18,38 +20,52 @@ def find_words (*links):
     import re
 
     words = set()
-    pool  = Pool(num_threads=parameters.num_threads)
 
     word_pattern = re.compile(r'([^\s\#]+)')
 
-    def work (unit):
-        logger.info('working %r', unit)
+    fields = ('name', 'email', 'sub', 'com', 'filename')
 
-        if isinstance(unit, Thread):
-            thread = unit.download_and_decode()
-            words  = set()
+    def extract (thread):
+        words = set()
 
-            for post in thread['posts']:
-                for field in ('name', 'email', 'sub', 'com', 'filename'):
-                    contents = post.get(field, '')
-                    contents = sanitize(contents).encode('utf8')
+        for post in thread.iter_posts(fields):
+            for contents in post:
+                contents = sanitize(contents).encode('utf8')
 
-                    words.update(word_pattern.findall(contents))
+                words.update(word_pattern.findall(contents))
 
-            return words
+        return words
+
+    def work (unit):
+        logger.info('working %r', unit)
+
+        if isinstance(unit, Thread):
+            return extract(unit)
 
         for e in unit.process():
             pool.push(work, e)
 
+    def work_shard (threads):
+        return set().union(*map(extract, threads))
+
     if not links:
         links = all_boards
 
+    if use_processes():
+        for result in map_threads(work_shard, *links):
+            words.update(result)
+
+        return words
+
+    pool = create_pool()
+
     for link in map(classify, links):
         pool.push(work, link)
-        pool.join()
 
-    logger.info('Join complete, updating with results.')
-    words.update(*pool.get_results())
+        for result in pool.iter_results():
+            words.update(result)
+
+    logger.info('Join complete.')
     pool.close()
 
     return words
@@ -0,0 +1,142 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+
+__all__ = ['BloomFilter']
+
+class BloomFilter (object):
+    """
+    BloomFilter(bits, hashes) -> new empty BloomFilter object
+
+    Probabilistic set of strings, membership tests may give false positives
+    but never false negatives.
+
+    Filters can be written to a file and loaded back memory-mapped. A filter
+    may record the stamp of the file it was built from, see file_stamp, so
+    that a filter of an older version of the file can be told apart.
+    """
+    magic = 'IWIBLOOM\x01'
+
+    # number of bits and number of hashes
+    header = struct.Struct('<QI')
+
+    # size and modification time of the file the filter was built from
+    stamp = struct.Struct('<Qd')
+
+    def __init__ (self, bits, hashes, data=None, start=0, source=None):
+        """
+        Initializes an instance from the number of bits and the number of hash
+        functions, optionally over existing data starting at some offset and
+        with the stamp of the file it was built from.
+        """
+        self.size   = bits
+        self.hashes = hashes
+        self.start  = start
+        self.source = source
+
+        if data is None:
+            data = bytearray((bits + 7) // 8)
+
+        self.data = data
+        self.view = buffer(data)
+
+    def __contains__ (self, elem):
+        """
+        x.__contains__(y) <==> y in x.
+        """
+        for position in self.positions(elem):
+            byte = ord(self.view[self.start + (position >> 3)])
+
+            if not byte & (1 << (position & 7)):
+                return False
+
+        return True
+
+    def add (self, elem):
+        """
+        Adds an element to this filter.
+        """
+        for position in self.positions(elem):
+            self.data[self.start + (position >> 3)] |= 1 << (position & 7)
+
+    def close (self):
+        """
+        Unmaps a loaded filter.
+        """
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def positions (self, elem):
+        """
+        Returns the bit positions of an element.
+        """
+        h1, h2 = struct.unpack('<QQ', hashlib.md5(elem).digest())
+
+        return ((h1 + i * h2) % self.size for i in xrange(self.hashes))
+
+    def write (self, filename):
+        """
+        Writes this filter to a file.
+        """
+        partial = filename + '.tmp'
+
+        with open(partial, 'wb') as f:
+            f.write(self.magic)
+            f.write(self.header.pack(self.size, self.hashes))
+            f.write(self.stamp.pack(*(self.source or (0, 0.0))))
+            f.write(self.view[self.start:])
+
+        os.rename(partial, filename)
+
+    @classmethod
+    def for_capacity (cls, capacity, error_rate=0.01):
+        """
+        Returns an empty filter sized for a number of elements with the given
+        false positive rate.
+        """
+        capacity = max(capacity, 1)
+
+        bits = int(math.ceil (
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        ))
+        hashes = max(int(round(float(bits) / capacity * math.log(2))), 1)
+
+        return cls(bits, hashes)
+
+    @staticmethod
+    def file_stamp (filename):
+        """
+        Returns the size and the modification time of a file, which change
+        whenever the file is rebuilt or extended.
+        """
+        status = os.stat(filename)
+
+        return status.st_size, status.st_mtime
+
+    @classmethod
+    def load (cls, filename):
+        """
+        Returns a filter memory-mapped from a file written by write, a filter
+        written without a stamp has None as its source.
+        """
+        with open(filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if data[:len(cls.magic)] != cls.magic:
+            data.close()
+            raise ValueError (
+                '{} is not a bloom filter.'.format(filename)
+            )
+
+        bits, hashes = cls.header.unpack_from(data, len(cls.magic))
+        start = len(cls.magic) + cls.header.size
+
+        source = cls.stamp.unpack_from(data, start)
+        start += cls.stamp.size
+
+        if source == (0, 0.0):
+            source = None
+
+        return cls(bits, hashes, data, start, source)
@@ -0,0 +1,77 @@
+import bisect
+
+__all__ = ['PackedSet']
+
+class PackedSet (object):
+    """
+    PackedSet(iterable) -> new PackedSet object
+
+    Build an immutable set of short strings packed into a single string.
+
+    Elements are padded to the width of the longest element and kept sorted,
+    so the set costs about width bytes per element and membership is tested
+    with a binary search.
+    """
+    class Elements (object):
+        """
+        Sequence view of the padded elements of a set.
+        """
+        def __init__ (self, data, width):
+            """
+            Initializes an instance from the packed elements and their width.
+            """
+            self.data  = data
+            self.width = width
+
+        def __getitem__ (self, i):
+            """
+            x.__getitem__(y) <==> x[y]
+            """
+            if not 0 <= i < len(self):
+                raise IndexError ('element index out of range')
+
+            return self.data[i * self.width:(i + 1) * self.width]
+
+        def __len__ (self):
+            """
+            x.__len__() <==> len(x)
+            """
+            return len(self.data) // self.width if self.width else 0
+
+    def __init__ (self, iterable=()):
+        """
+        x.__init__(...) initializes x; see help(type(x)) for signature
+        """
+        elements = set(iterable)
+
+        self.width = max(map(len, elements)) if elements else 0
+        self.data  = ''.join (
+            sorted(elem.ljust(self.width, '\0') for elem in elements)
+        )
+
+    def __contains__ (self, elem):
+        """
+        x.__contains__(y) <==> y in x.
+        """
+        if len(elem) > self.width:
+            return False
+
+        elem = elem.ljust(self.width, '\0')
+        elements = PackedSet.Elements(self.data, self.width)
+
+        index = bisect.bisect_left(elements, elem)
+
+        return index != len(elements) and elements[index] == elem
+
+    def __iter__ (self):
+        """
+        x.__iter__() <==> iter(x)
+        """
+        for elem in PackedSet.Elements(self.data, self.width):
+            yield elem.rstrip('\0')
+
+    def __len__ (self):
+        """
+        x.__len__() <==> len(x)
+        """
+        return len(PackedSet.Elements(self.data, self.width))
@@ -1,3 +1,5 @@
-from SortedSet import SortedSet
+from BloomFilter import BloomFilter
+from PackedSet   import PackedSet
+from SortedSet   import SortedSet
 
-__all__ = ['SortedSet']
+__all__ = ['BloomFilter', 'PackedSet', 'SortedSet']
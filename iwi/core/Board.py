@@ -42,14 +42,18 @@ class Board (WebEntity):
     def process (self):
         """
         Returns the Thread instances you get by evaluating the board.
+
+        The thread list is decoded one page at a time.
         """
-        pages   = self.download_and_decode()
         threads = []
 
-        for page in pages:
+        for page in self.download_and_iterate():
             for thread in page['threads']:
                 threads.append (
-                    Thread(self.board, thread['no'])
+                    Thread (
+                        self.board, thread['no'],
+                        thread.get('last_modified')
+                    )
                 )
 
         return threads
@@ -8,6 +8,10 @@ class Image (WebEntity):
     """
     Represents an image.
     """
+    __slots__ = ('board', 'tim', 'ext', 'filename')
+
+    cacheable = False
+
     def __init__ (self, board, tim, ext, filename):
         self.board = board
         self.tim = tim
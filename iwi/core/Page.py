@@ -54,8 +54,10 @@ class Page (Board):
         threads = []
 
         for thread in page['threads']:
+            op = thread['posts'][0]
+
             threads.append (
-                Thread(self.board, thread['posts'][0]['no'])
+                Thread(self.board, op['no'], op.get('last_modified'))
             )
 
         return threads
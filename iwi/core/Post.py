@@ -8,7 +8,16 @@ __all__ = ['Post']
 class Post (WebEntity):
     """
     Represents a post with a tripcode.
+
+    Posts are made for every post of every thread so they are kept small with
+    __slots__.
     """
+    __slots__ = (
+        'board', 'thread', 'post', 'name', 'time', 'public', 'secure', 'image'
+    )
+
+    cacheable = False
+
     def __init__ (self,
                   board=None,  thread=None, post=None,
                   name=None,   time=None,
@@ -8,6 +8,8 @@ class Public (Tripcode):
     """
     Represents a regular tripcode.
     """
+    __slots__ = ()
+
     pattern = re.compile(r'^!([\w\.\/]+)')
 
     def __str__ (self):
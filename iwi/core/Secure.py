@@ -8,6 +8,8 @@ class Secure (Tripcode):
     """
     Represents a secure tripcode.
     """
+    __slots__ = ()
+
     pattern = re.compile(r'!!([\w\+\/]+)$')
 
     def __str__ (self):
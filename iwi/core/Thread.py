@@ -14,13 +14,16 @@ class Thread (WebEntity):
     """
     default_object = {'posts':[]}
 
-    def __init__ (self, board, thread):
+    def __init__ (self, board, thread, last_modified=None):
         """
-        Initializes an instance from a board and a thread number.
+        Initializes an instance from a board, a thread number and optionally
+        the UNIX timestamp of the last modification of the thread.
         """
         self.board  = board
         self.thread = thread
 
+        self.last_modified = last_modified
+
     def __repr__ (self):
         """
         Returns a string representation fit for eval.
@@ -50,41 +53,114 @@ class Thread (WebEntity):
             '/{self.board}/thread/{self.thread}'.format(self=self)
         )
 
+    def iter_posts (self, fields=('no',)):
+        """
+        Yields a tuple of the requested fields of every post of the thread as
+        the API gives them, fields missing from a post are ''.
+
+        Unlike process this neither unescapes anything nor makes Post,
+        tripcode or Image instances, so it is the cheaper choice for programs
+        that need only a few fields.
+        """
+        if not self.webcache.keep_parsed:
+            for post in self.download_and_decode()['posts']:
+                yield tuple([post.get(field, '') for field in fields])
+            return
+
+        names, rows = self.parsed()
+        columns = [
+            names.index(field) if field in names else None for field in fields
+        ]
+
+        for row in rows:
+            yield tuple ([
+                '' if column is None or row[column] is None else row[column]
+                for column in columns
+            ])
+
+    def parsed (self):
+        """
+        Returns the posts of the thread as a (fields, rows) pair, every row
+        holds the values of the fields of a post with None for missing ones.
+
+        The pair is stored in the web cache and read back from it instead of
+        decoding the thread as long as the thread has not changed, offline the
+        thread is not even read from the cache then. A thread that can not be
+        downloaded or decoded has no posts, and nothing is stored for it.
+        """
+        key = self.webcache.url_to_key(self.apiurl)
+
+        if not self.webcache.online:
+            parsed = self.webcache.get_parsed(key)
+
+            if parsed is not None:
+                return parsed
+
+        contents = self.download()
+
+        if not contents:
+            return (), []
+
+        # the version of the contents just downloaded, not of what is cached
+        version = self.webcache.downloaded_version()
+
+        if self.webcache.online and version is not None:
+            parsed = self.webcache.get_parsed(key, version)
+
+            if parsed is not None:
+                return parsed
+
+        decoded = self.decode(contents, version)
+
+        if decoded is self.default_object:
+            return (), []
+
+        posts = decoded['posts']
+
+        names = tuple(sorted(set().union(*posts)))
+        rows  = [tuple([post.get(name) for name in names]) for post in posts]
+
+        self.webcache.set_parsed(key, version, (names, rows))
+
+        return names, rows
+
     def process (self):
         """
         Returns the Post instances you get by evaluating the thread.
         """
-        thread = self.download_and_decode()
         posts  = []
+        fields = ('no', 'time', 'name', 'trip', 'tim', 'ext', 'filename')
 
-        for post in thread['posts']:
-            post['trip'] = str(post.get('trip', ''))
-            pub_match = Public.pattern.match (post['trip'])
-            sec_match = Secure.pattern.search(post['trip'])
+        for no, time, name, trip, tim, ext, filename in self.iter_posts(fields):
+            trip = str(trip)
+            pub_match = Public.pattern.match (trip)
+            sec_match = Secure.pattern.search(trip)
 
             public = Public(pub_match.group(1)) if pub_match else None
             secure = Secure(sec_match.group(1)) if sec_match else None
 
-            name = unescape(post.get('name', ''))
+            name = unescape(name)
             name = name.encode('utf8')
 
-            if post.has_key('tim') and post.has_key('ext'):
-                post['image'] = Image (
+            image = None
+
+            if tim != '' and ext != '':
+                image = Image (
                     self.board,
-                    post['tim'], post['ext'].encode('utf8'),
-                    post['filename'].encode('utf8')
+                    tim, ext.encode('utf8'),
+                    filename.encode('utf8')
                 )
 
             posts.append (
                 Post (
                     name   = name,
-                    time   = post['time'],
+                    time   = time,
                     board  = self.board,
                     thread = self.thread,
-                    post   = post['no'],
+                    post   = no,
                     public = public,
                     secure = secure,
-                    image  = post.get('image')
+                    image  = image
                 )
             )
 
@@ -3,7 +3,11 @@ __all__ = ['Tripcode']
 class Tripcode (object):
     """
     Base class for tripcodes.
+
+    Derivatives must declare __slots__ as well to keep instances small.
     """
+    __slots__ = ('cipher', 'key')
+
     def __init__ (self, cipher, key=None):
         """
         Initializes a new instance from a ciphertext and an optional key.
@@ -1,10 +1,10 @@
-try:
-    import json
-except ImportError:
-    import simplejson as json
-
+from ..web import Decoder
 from ..web import WebCache
 
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
 __all__ = ['WebEntity']
 
 class WebEntity (object):
@@ -12,11 +12,23 @@ class WebEntity (object):
     Represents a base web entity from the imageboard.
 
     Classes that derive from this are typically boards, pages and threads.
+
+    No instance attributes are declared here so that derivatives made in large
+    numbers, like posts, can do without a __dict__ through __slots__.
     """
+    __slots__ = ()
+
     timeout = 10.0
 
+    # whether the contents of the API URL are kept in the web cache
+    cacheable = True
+
+    # UNIX timestamp of the last modification if known beforehand
+    last_modified = None
+
     default_object = None
     webcache = WebCache()
+    decoder  = Decoder()
 
     @property
     def apiurl (self):
@@ -43,16 +55,26 @@ class WebEntity (object):
         """
         return self.webcache.download (
             self.apiurl,
-            timeout=self.timeout, bypass_cache=bypass_cache
+            timeout=self.timeout, bypass_cache=bypass_cache,
+            last_modified=self.last_modified
         )
 
-    def decode (self, s):
+    def decode (self, s, version=None):
         """
         Decodes and returns the JSON object in s or the default value if it
         fails.
+
+        If the version of the contents, their Last-Modified value, is given the
+        decoder may hand out the object it decoded for the same version
+        before, so the object must not be modified.
+
+        The time spent decoding is recorded in the statistics of the web cache.
         """
+        key = None if version is None else self.apiurl
+
         try:
-            return json.loads(s)
+            with self.webcache.statistics.timer('decode'):
+                return self.decoder.decode(s, key, version)
         except ValueError:
             return self.default_object
 
@@ -61,7 +83,55 @@ class WebEntity (object):
         Downloads the API URL contents, decodes them and returns the resulting
         object, or the default value if that fails.
         """
-        return self.decode(self.download(bypass_cache=bypass_cache))
+        contents = self.download(bypass_cache=bypass_cache)
+        return self.decode(contents, self.version(bypass_cache))
+
+    def download_and_iterate (self, bypass_cache=False):
+        """
+        Downloads the API URL contents, which must be a JSON array, and yields
+        its elements as they are decoded.
+
+        If the contents are not an array the elements of the default value are
+        yielded instead, if they break off partway the elements decoded so far
+        are all that is yielded.
+        """
+        contents = self.download(bypass_cache=bypass_cache)
+        elements = self.decoder.iter_array(contents)
+        timer    = self.webcache.statistics.timer
+        count    = 0
+
+        while True:
+            try:
+                with timer('decode'):
+                    element = next(elements)
+            except StopIteration:
+                return
+            except ValueError as e:
+                if count:
+                    logger.warning('%r broke off: %s', self, e)
+                    return
+
+                for element in self.default_object or ():
+                    yield element
+                return
+
+            count += 1
+            yield element
+
+    def version (self, bypass_cache=False):
+        """
+        Returns the Last-Modified value of the cached contents of the API URL,
+        or None if there is none.
+        """
+        if bypass_cache or not self.cacheable:
+            return None
+
+        key = self.webcache.url_to_key(self.apiurl)
+
+        if not self.webcache.has_key(key):
+            return None
+
+        return self.webcache.get_lastmodified(key)
 
     def process (self):
         """
@@ -0,0 +1,54 @@
+from . import Solver
+
+__all__ = ['FilteredSolver']
+
+class FilteredSolver (Solver):
+    """
+    Solver that consults a bloom filter of the tripcodes another solver knows
+    about before asking it, so that tripcodes without a solution rarely cost
+    a lookup.
+    """
+    def __init__ (self, solver, bloom):
+        """
+        Initializes an instance from a solver and a filter of its tripcodes.
+        """
+        self.solver = solver
+        self.bloom  = bloom
+
+        self.lookups  = 0
+        self.rejected = 0
+        self.solved   = 0
+
+    def solve (self, tripcode):
+        """
+        Asks the solver for a solution unless the filter rules it out.
+        """
+        return self.solve_many((tripcode,)).get(tripcode)
+
+    def solve_many (self, tripcodes):
+        """
+        Asks the solver for solutions to the tripcodes that the filter does
+        not rule out.
+        """
+        tripcodes = set(tripcodes)
+        passed = [tripcode for tripcode in tripcodes if tripcode in self.bloom]
+
+        self.lookups  += len(tripcodes)
+        self.rejected += len(tripcodes) - len(passed)
+
+        solutions = self.solver.solve_many(passed) if passed else {}
+        self.solved += len(solutions)
+
+        return solutions
+
+    def statistics (self):
+        """
+        Returns the counters of this solver as a dictionary, false positives
+        are tripcodes that passed the filter without having a solution.
+        """
+        return {
+            'lookups'         : self.lookups,
+            'rejected'        : self.rejected,
+            'solved'          : self.solved,
+            'false_positives' : self.lookups - self.rejected - self.solved
+        }
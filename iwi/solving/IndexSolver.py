@@ -0,0 +1,180 @@
+import bisect
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from . import Solver
+
+__all__ = ['IndexSolver']
+
+class IndexSolver (Solver):
+    """
+    Solver that uses a pre-built binary index for solutions.
+
+    The index file is a header followed by the tripcodes as a sorted array of
+    fixed-width keys, an array of offsets and a blob holding the solutions.
+    The file is memory-mapped and tripcodes are found by binary search, so
+    opening an index is instant no matter how large it is and processes using
+    the same index share it in memory.
+    """
+    magic = 'IWITRIP\x01'
+
+    # key width and number of keys
+    header = struct.Struct('<IQ')
+
+    offset = struct.Struct('<Q')
+
+    class Keys (object):
+        """
+        Sequence view of the keys of an index.
+        """
+        def __init__ (self, data, start, width, count):
+            """
+            Initializes an instance from the mapped index, where the keys
+            start, their width and how many there are.
+            """
+            self.data  = data
+            self.start = start
+            self.width = width
+            self.count = count
+
+        def __getitem__ (self, i):
+            """
+            Returns the i-th key.
+            """
+            if not 0 <= i < self.count:
+                raise IndexError ('key index out of range')
+
+            position = self.start + i * self.width
+            return self.data[position:position + self.width]
+
+        def __len__ (self):
+            """
+            Returns the number of keys.
+            """
+            return self.count
+
+    def __init__ (self, filename):
+        """
+        Initializes an instance from an index file.
+        """
+        self.filename = filename
+
+        with open(filename, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.data[:len(self.magic)] != self.magic:
+            raise ValueError (
+                '{} is not a tripcode index.'.format(filename)
+            )
+
+        self.width, self.count = self.header.unpack_from (
+            self.data, len(self.magic)
+        )
+
+        keys_start = len(self.magic) + self.header.size
+        self.offsets_start = keys_start + self.width * self.count
+        self.blob_start = (
+            self.offsets_start + self.offset.size * (self.count + 1)
+        )
+
+        self.keys = IndexSolver.Keys (
+            self.data, keys_start, self.width, self.count
+        )
+
+    def __len__ (self):
+        """
+        Returns the number of tripcodes in the index.
+        """
+        return self.count
+
+    def close (self):
+        """
+        Unmaps the index.
+        """
+        self.data.close()
+
+    def solve (self, tripcode):
+        """
+        Checks the index for a solution to the tripcode.
+        """
+        if len(tripcode) > self.width:
+            return None
+
+        key = tripcode.ljust(self.width, '\0')
+        i = bisect.bisect_left(self.keys, key)
+
+        if i == self.count or self.keys[i] != key:
+            return None
+
+        start, end = (
+            self.offset.unpack_from (
+                self.data, self.offsets_start + j * self.offset.size
+            )[0] for j in (i, i + 1)
+        )
+
+        return self.data[self.blob_start + start:self.blob_start + end]
+
+    @classmethod
+    def write (cls, filename, pairs, width=11):
+        """
+        Writes an index from an iterable of tripcode and solution pairs sorted
+        by tripcode, tripcodes are padded to width bytes.
+
+        Only the first solution to a tripcode is kept. Returns the number of
+        tripcodes written.
+        """
+        keys    = tempfile.TemporaryFile()
+        offsets = tempfile.TemporaryFile()
+        blob    = tempfile.TemporaryFile()
+
+        count    = 0
+        position = 0
+        previous = None
+
+        for tripcode, solution in pairs:
+            if len(tripcode) > width:
+                raise ValueError (
+                    'tripcode {!r} is longer than {} bytes.'.format (
+                        tripcode, width
+                    )
+                )
+
+            key = tripcode.ljust(width, '\0')
+
+            if previous is not None and key <= previous:
+                if key == previous:
+                    continue
+
+                raise ValueError (
+                    'tripcodes must be sorted, {!r} follows {!r}.'.format (
+                        tripcode, previous.rstrip('\0')
+                    )
+                )
+
+            keys.write(key)
+            offsets.write(cls.offset.pack(position))
+            blob.write(solution)
+
+            position += len(solution)
+            previous  = key
+            count    += 1
+
+        offsets.write(cls.offset.pack(position))
+
+        partial = filename + '.tmp'
+
+        with open(partial, 'wb') as f:
+            f.write(cls.magic)
+            f.write(cls.header.pack(width, count))
+
+            for section in (keys, offsets, blob):
+                section.seek(0)
+                shutil.copyfileobj(section, f)
+                section.close()
+
+        os.rename(partial, filename)
+
+        return count
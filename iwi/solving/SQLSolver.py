@@ -12,6 +12,9 @@ class SQLSolver (Solver):
     two columns named 'tripcode' and 'solution', where 'tripcode' is the
     tripcode generated by 'solution'.
     """
+    # sqlite allows at most 999 parameters per statement
+    chunk_size = 500
+
     def __init__ (self, dbname):
         """
         Initializes an instance from a database.
@@ -40,3 +43,41 @@ class SQLSolver (Solver):
         db_conn.close()
 
         return None if s is None else s[0]
+
+    def solve_many (self, tripcodes):
+        """
+        Checks the database for solutions to several tripcodes using a single
+        connection, the tripcodes are looked up in chunks.
+        """
+        tripcodes = list(set(tripcodes))
+        solutions = {}
+
+        if not tripcodes:
+            return solutions
+
+        db_conn = sqlite3.connect(self.dbname)
+        db_conn.text_factory = str
+
+        db_cursor = db_conn.cursor()
+
+        for i in xrange(0, len(tripcodes), self.chunk_size):
+            chunk = tripcodes[i:i+self.chunk_size]
+
+            db_cursor.execute (
+                '\n'.join ((
+                        'SELECT tripcode, solution',
+                        'FROM   solutions',
+                        'WHERE  tripcode IN ({})'.format (
+                            ', '.join('?' * len(chunk))
+                        )
+                 )),
+                chunk
+            )
+
+            for tripcode, solution in db_cursor:
+                solutions.setdefault(tripcode, solution)
+
+        db_cursor.close()
+        db_conn.close()
+
+        return solutions
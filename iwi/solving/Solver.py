@@ -14,3 +14,21 @@ class Solver (object):
         raise NotImplementedError (
             'Solver derivatives must implement this method!'
         )
+
+    def solve_many (self, tripcodes):
+        """
+        Attempts to solve several tripcodes at once.
+
+        Returns a dictionary from tripcode to key for the tripcodes that were
+        solved. Derivatives may override this with something faster than
+        solving the tripcodes one by one.
+        """
+        solutions = {}
+
+        for tripcode in set(tripcodes):
+            key = self.solve(tripcode)
+
+            if key is not None:
+                solutions[tripcode] = key
+
+        return solutions
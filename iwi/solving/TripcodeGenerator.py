@@ -0,0 +1,174 @@
+import collections
+import crypt
+import itertools
+import multiprocessing
+import sqlite3
+import string
+
+__all__ = ['TripcodeGenerator']
+
+# characters that 4chan replaces with HTML entities before hashing
+entities = [
+    ('&', '&amp;'),
+    ('"', '&quot;'),
+    ('<', '&lt;'),
+    ('>', '&gt;')
+]
+
+salt_table = string.maketrans (
+    ':;<=>?@[\\]^_`',
+    'ABCDEFGabcdef'
+)
+
+def tripcode (candidate):
+    """
+    Returns the regular tripcode of a UTF-8 encoded candidate, or None if the
+    candidate can not be used as a tripcode.
+    """
+    try:
+        key = candidate.decode('utf8').encode('shift_jis')
+    except (UnicodeDecodeError, UnicodeEncodeError):
+        return None
+
+    for character, entity in entities:
+        key = key.replace(character, entity)
+
+    if not key or '\0' in key:
+        return None
+
+    salt = ''.join (
+        c if '.' <= c <= 'z' else '.' for c in (key + 'H..')[1:3]
+    ).translate(salt_table)
+
+    return crypt.crypt(key, salt)[-10:]
+
+# tripcodes that are worth keeping in the current process, None keeps all
+targets = None
+
+def set_targets (wanted):
+    """
+    Sets the tripcodes that generate_batch keeps in the current process.
+    """
+    global targets
+    targets = wanted
+
+def generate_batch (candidates):
+    """
+    Returns the tripcode and candidate pairs for a batch of candidates.
+    """
+    pairs = []
+
+    for candidate in candidates:
+        cipher = tripcode(candidate)
+
+        if cipher is not None and (targets is None or cipher in targets):
+            pairs.append((cipher, candidate))
+
+    return pairs
+
+class TripcodeGenerator (object):
+    """
+    Computes the regular tripcodes of candidate solutions, like the words
+    gathered by dump_words.py, with a pool of processes.
+
+    Candidates are handed to the processes in batches so that the cost of
+    moving them between processes is small compared to hashing them. Only a
+    few batches are in flight at a time, so candidates can be streamed from
+    files that do not fit in memory.
+
+    If a collection of target tripcodes is given only candidates that hash to
+    one of them are kept, the collection is sent to every process once.
+    """
+    # batches in flight per process
+    backlog = 4
+
+    def __init__ (self, processes=None, batch_size=4096, targets=None):
+        """
+        Initializes an instance from the number of processes to use, by default
+        one per CPU, the number of candidates in a batch and optionally the
+        tripcodes to keep.
+        """
+        self.processes  = processes or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+        self.targets    = targets
+
+    def batches (self, candidates):
+        """
+        Splits candidates into batches.
+        """
+        candidates = iter(candidates)
+
+        while True:
+            batch = list(itertools.islice(candidates, self.batch_size))
+
+            if not batch:
+                break
+
+            yield batch
+
+    def generate (self, candidates):
+        """
+        Yields the tripcode and candidate pairs for the candidates, candidates
+        that can not be used or miss the targets are skipped.
+        """
+        if self.processes == 1:
+            for batch in self.batches(candidates):
+                for cipher, candidate in generate_batch(batch):
+                    if self.targets is None or cipher in self.targets:
+                        yield cipher, candidate
+            return
+
+        workers = multiprocessing.Pool (
+            self.processes, set_targets, (self.targets,)
+        )
+        inflight = collections.deque()
+
+        try:
+            for batch in self.batches(candidates):
+                inflight.append(workers.apply_async(generate_batch, (batch,)))
+
+                if len(inflight) >= self.processes * self.backlog:
+                    for pair in inflight.popleft().get():
+                        yield pair
+
+            while inflight:
+                for pair in inflight.popleft().get():
+                    yield pair
+
+            workers.close()
+        finally:
+            workers.terminate()
+            workers.join()
+
+    def write (self, dbname, candidates):
+        """
+        Writes the tripcodes of the candidates to an SQL database fit for use
+        with SQLSolver.
+
+        Returns the number of tripcodes written.
+        """
+        db_conn = sqlite3.connect(dbname)
+        db_conn.text_factory = str
+
+        db_cursor = db_conn.cursor()
+        db_cursor.execute (
+            '\n'.join ((
+                    'CREATE TABLE IF NOT EXISTS solutions (',
+                    '    tripcode TEXT PRIMARY KEY,',
+                    '    solution TEXT',
+                    ')'
+            ))
+        )
+        db_cursor.execute('PRAGMA synchronous=OFF')
+
+        db_cursor.executemany (
+            'REPLACE INTO solutions VALUES (?,?)',
+            self.generate(candidates)
+        )
+        count = db_cursor.rowcount
+
+        db_conn.commit()
+        db_cursor.close()
+        db_conn.close()
+
+        return count
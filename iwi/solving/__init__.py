@@ -1,2 +1,5 @@
-from Solver    import Solver
-from SQLSolver import SQLSolver
+from Solver            import Solver
+from SQLSolver         import SQLSolver
+from IndexSolver       import IndexSolver
+from FilteredSolver    import FilteredSolver
+from TripcodeGenerator import TripcodeGenerator
@@ -0,0 +1,261 @@
+import collections
+import heapq
+import itertools
+import time
+
+from ..web import AsyncFetcher
+from ..web import UniformRetryStrategy
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['AsyncPool']
+
+class AsyncPool (object):
+    """
+    Single-threaded alternative to Pool.
+
+    Jobs are pushed the same way as with Pool, but when the first argument of
+    a job is a cacheable WebEntity its API URL is fetched with a conditional
+    GET through an AsyncFetcher before the job is run, so that many downloads
+    are in flight at once while jobs themselves run one at a time and find
+    their contents in the web cache.
+
+    Fetches are started when the request scheduler of the web cache allows
+    them.
+
+    Requests, jobs and the depth of the queues are recorded in the statistics
+    of the web cache.
+    """
+    def __init__ (self, webcache, concurrency=64):
+        """
+        Initializes an instance from a web cache and the number of downloads
+        to keep in flight.
+        """
+        self.webcache   = webcache
+        self.statistics = webcache.statistics
+        self.fetcher    = AsyncFetcher (
+            concurrency, statistics=self.statistics
+        )
+        self.started    = time.time()
+
+        self.ready   = collections.deque()
+        self.timers  = []
+        self.counter = itertools.count()
+        self.results = collections.deque()
+        self.closed  = False
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, *ignored):
+        self.close()
+
+    def close (self):
+        """
+        Finishes every job, after executing this method the pool is no longer
+        operational.
+        """
+        if self.closed:
+            return
+
+        self.join()
+        self.fetcher.close()
+
+        self.statistics.add_time('pool_thread_time', time.time() - self.started)
+        self.closed = True
+
+    def fetch (self, unit, job, retrier=None):
+        """
+        Schedules fetching the API URL of a web entity, the job is made ready
+        when the fetch is done.
+        """
+        wait = self.webcache.scheduler.acquire(unit.apiurl)
+
+        if wait > 0:
+            self.schedule(wait, self.start, unit, job, retrier)
+        else:
+            self.start(unit, job, retrier)
+
+    def start (self, unit, job, retrier):
+        """
+        Starts fetching the API URL of a web entity.
+        """
+        url = unit.apiurl
+        key = self.webcache.url_to_key(url)
+
+        def callback (error, response, contents):
+            self.fetched(unit, job, retrier, key, error, response, contents)
+
+        self.fetcher.fetch (
+            url, self.webcache.request_headers(key),
+            callback, timeout=unit.timeout
+        )
+
+        self.statistics.count('requests')
+        self.statistics.maximum('pool_in_flight', len(self.fetcher))
+
+    def fetched (self, unit, job, retrier, key, error, response, contents):
+        """
+        Stores the outcome of a fetch in the web cache and either makes the
+        job ready or schedules another attempt.
+        """
+        if error is None:
+            self.statistics.count('responses_200')
+            self.statistics.count('bytes_received', len(contents))
+            self.webcache.scheduler.register_success(unit.apiurl)
+            self.webcache.modified (
+                key, response.getheader('last-modified'), contents
+            )
+            self.webcache.mark_fresh(key)
+            self.ready.append(job)
+            return
+
+        if getattr(error, 'code', None) == 304 and self.webcache.has_key(key):
+            self.statistics.count('responses_304')
+            self.webcache.scheduler.register_success(unit.apiurl)
+            self.webcache.mark_fresh(key)
+            self.ready.append(job)
+            return
+
+        logger.debug('got on %s exception %s', unit.apiurl, error)
+        self.statistics.count('errors')
+        self.webcache.scheduler.register_error(unit.apiurl, error)
+
+        if retrier is None:
+            retrier = UniformRetryStrategy (
+                self.webcache.retry_times,
+                self.webcache.retry_lower,
+                self.webcache.retry_upper
+            )
+
+        try:
+            retrier.register_error(error)
+            retry = retrier.seconds()
+        except Exception as e:
+            logger.error('%s', e)
+            retry = None
+
+        if retry is None:
+            self.webcache.mark_fresh(key, success=False)
+            self.ready.append(job)
+            return
+
+        logger.debug('sleeping on %s for %s seconds', unit.apiurl, retry)
+        self.statistics.count('retries')
+        self.statistics.add_time('retry_sleep', retry)
+        self.schedule(retry, self.fetch, unit, job, retrier)
+
+    def get_results (self):
+        """
+        Retrieves every result gathered so far.
+        """
+        results = list(self.results)
+        self.results.clear()
+
+        return results
+
+    def schedule (self, seconds, obj, *args):
+        """
+        Calls obj with args from the event loop after a number of seconds.
+        """
+        heapq.heappush (
+            self.timers, (time.time() + seconds, next(self.counter), obj, args)
+        )
+
+    def iter_results (self):
+        """
+        Yields results as they are produced until every enqueued job is
+        finished, the event loop only runs while results are consumed.
+        """
+        while True:
+            while self.results:
+                yield self.results.popleft()
+
+            if not self.pending():
+                break
+
+            self.step()
+
+    def pending (self):
+        """
+        Returns whether there are jobs that are not finished.
+        """
+        return bool(self.ready or self.timers or len(self.fetcher))
+
+    def push (self, obj, *args, **kwargs):
+        """
+        Pushes a job onto the queue.
+
+        If this pool is closed then a RuntimeError is raised.
+        """
+        if self.closed:
+            raise RuntimeError ('Can\'t add jobs to a closed pool.')
+
+        job  = (obj, args, kwargs)
+        unit = args[0] if args else None
+
+        if (self.webcache.online and getattr(unit, 'cacheable', False) and
+            not self.webcache.is_unchanged(unit.apiurl, unit.last_modified)):
+            self.fetch(unit, job)
+        else:
+            self.ready.append(job)
+
+        self.statistics.count('pool_pushed')
+        self.statistics.maximum('pool_queue_depth', len(self.ready))
+
+    def run (self, job):
+        """
+        Runs a single job, dropping whatever it left unused in the web cache.
+        """
+        obj, args, kwargs = job
+        started = time.time()
+
+        try:
+            res = obj(*args, **kwargs)
+
+            if res is not None:
+                self.results.append(res)
+        except Exception as e:
+            logger.error('%s', e)
+        finally:
+            self.statistics.count('pool_jobs')
+            self.statistics.add_time('pool_busy', time.time() - started)
+
+            unit = args[0] if args else None
+
+            if getattr(unit, 'cacheable', False):
+                self.webcache.fresh.pop (
+                    self.webcache.url_to_key(unit.apiurl), None
+                )
+
+    def join (self):
+        """
+        Runs the event loop until every enqueued job is finished.
+        """
+        while self.pending():
+            self.step()
+
+    def step (self):
+        """
+        Runs the ready jobs and the due timers and then waits a little for
+        network events.
+        """
+        for _ in xrange(len(self.ready)):
+            self.run(self.ready.popleft())
+
+        now = time.time()
+
+        while self.timers and self.timers[0][0] <= now:
+            _, _, obj, args = heapq.heappop(self.timers)
+            obj(*args)
+
+        if self.ready:
+            timeout = 0.0
+        elif self.timers:
+            timeout = min(self.timers[0][0] - now, 0.1)
+        else:
+            timeout = 0.1
+
+        self.fetcher.poll(max(timeout, 0.0))
@@ -1,6 +1,9 @@
 import Queue
 import sys
 import threading
+import time
+
+from ..web import Statistics
 
 import logging
 logger = logging.getLogger(__name__)
@@ -11,6 +14,9 @@ __all__ = ['Pool']
 class Pool (object):
     """
     Simplistic thread pool.
+
+    The jobs run, the time the workers spend busy and the depth of the job
+    queue are recorded in statistics.
     """
     class WorkerExit (object):
         """
@@ -34,6 +40,16 @@ class Pool (object):
             self.pool = pool
 
         def run (self):
+            """
+            Runs the worker, under a profile of its own when the pools are
+            profiled.
+            """
+            if Pool.profiler is None:
+                self.work()
+            else:
+                Pool.profiler.runcall(self.work)
+
+        def work (self):
             """
             Spins on the job queue reading jobs and writing results.
             """
@@ -43,24 +59,39 @@ class Pool (object):
                 obj, args, kwargs = self.pool.job_queue.get()
 
                 try:
-                    res = obj(*args, **kwargs)
-
-                    if res is not None:
-                        self.pool.res_queue.put(res)
-                except Exception as e:
-                    logger.error('%s', e)
+                    self.pool.run(obj, args, kwargs)
                 finally:
                     self.pool.job_queue.task_done()
 
     sentinel = WorkerExit()
 
-    def __init__ (self, num_threads=32, use_daemons=True):
+    # Profiler that the worker threads of every pool run under, if any
+    profiler = None
+
+    def __init__ (self, num_threads=32, use_daemons=True, max_results=0, max_jobs=0, statistics=None):
         """
         Initializes an instance with a certain number of threads.
+
+        If max_results is positive workers wait once that many results are
+        waiting to be retrieved, such a pool must be drained with iter_results
+        as join would wait forever on a full result queue.
+
+        If max_jobs is positive pushes wait once that many jobs are queued,
+        except for those of the workers themselves, a worker runs the job it
+        pushes onto a full queue right away.
+
+        The statistics parameter is an optional Statistics instance to record
+        in, like the one of a web cache.
         """
+        if statistics is None:
+            self.statistics = Statistics()
+        else:
+            self.statistics = statistics
+
+        self.started     = time.time()
         self.num_threads = num_threads
-        self.job_queue   = Queue.Queue()
-        self.res_queue   = Queue.Queue()
+        self.job_queue   = Queue.Queue(max_jobs)
+        self.res_queue   = Queue.Queue(max_results)
         self.threads     = []
         self.closed      = False
 
@@ -97,6 +128,10 @@ class Pool (object):
         for thread in self.threads:
             thread.join()
 
+        self.statistics.add_time (
+            'pool_thread_time', (time.time() - self.started) * self.num_threads
+        )
+
         self.closed = True
 
     def get_results (self):
@@ -112,6 +147,24 @@ class Pool (object):
 
         return results
 
+    def iter_results (self, poll=0.1):
+        """
+        Yields results as they are produced until every enqueued job is
+        finished, checking whether the jobs are done every poll seconds when
+        no results arrive.
+        """
+        while True:
+            try:
+                res = self.res_queue.get(timeout=poll)
+            except Queue.Empty:
+                # workers put their results before marking their jobs done
+                if self.job_queue.unfinished_tasks or not self.res_queue.empty():
+                    continue
+                break
+
+            self.res_queue.task_done()
+            yield res
+
     def push (self, obj, *args, **kwargs):
         """
         Pushes a job onto the queue.
@@ -121,7 +174,40 @@ class Pool (object):
         if self.closed:
             raise RuntimeError ('Can\'t add jobs to a closed pool.')
 
-        self.job_queue.put((obj, args, kwargs))
+        job = (obj, args, kwargs)
+
+        if getattr(threading.current_thread(), 'pool', None) is self:
+            # a worker waiting on a full queue might wait on itself
+            try:
+                self.job_queue.put_nowait(job)
+            except Queue.Full:
+                self.statistics.count('pool_pushed')
+                self.statistics.count('pool_inline')
+                return self.run(*job)
+        else:
+            self.job_queue.put(job)
+
+        if obj is not self.sentinel:
+            self.statistics.count('pool_pushed')
+            self.statistics.maximum('pool_queue_depth', self.job_queue.qsize())
+
+    def run (self, obj, args, kwargs):
+        """
+        Runs a single job and queues its result.
+        """
+        started = time.time()
+
+        try:
+            res = obj(*args, **kwargs)
+
+            if res is not None:
+                self.res_queue.put(res)
+        except Exception as e:
+            logger.error('%s', e)
+        finally:
+            if obj is not self.sentinel:
+                self.statistics.count('pool_jobs')
+                self.statistics.add_time('pool_busy', time.time() - started)
 
     def join (self):
         """
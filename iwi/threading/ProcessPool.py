@@ -0,0 +1,104 @@
+import cProfile
+import multiprocessing
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['ProcessPool']
+
+def run_shard (index):
+    """
+    Runs the current job on one shard, called in the worker processes.
+
+    The result is sent back along with what the shard recorded in the
+    statistics of the pool and, when the pools are profiled, with the stats of
+    the profile of the shard.
+    """
+    function, shards, statistics = ProcessPool.current
+
+    if statistics is not None:
+        # another thread of the parent may have held the lock when it forked
+        statistics.lock = threading.Lock()
+        statistics.reset()
+
+    if ProcessPool.profiler is None:
+        result = function(shards[index])
+        stats  = None
+    else:
+        profile = cProfile.Profile()
+        result  = profile.runcall(function, shards[index])
+        profile.create_stats()
+        stats   = profile.stats
+
+    if statistics is not None:
+        statistics = statistics.statistics()
+
+    return result, stats, statistics
+
+class ProcessPool (object):
+    """
+    Simplistic fork based process pool for CPU-bound work.
+
+    Items are split into one shard per process and the processes are forked
+    after the job is set up, so the function and the items are inherited by
+    the workers instead of being pickled, only the partial results travel back
+    to be merged. Anything the parent has open, like a memory-mapped web cache,
+    is shared with the workers.
+    """
+    # the job being mapped, inherited by the workers when they are forked
+    current = None
+
+    # Profiler that the stats of the workers are added to, if any
+    profiler = None
+
+    def __init__ (self, num_processes=None, statistics=None):
+        """
+        Initializes an instance with a certain number of processes, by default
+        one per CPU.
+
+        The statistics parameter is an optional Statistics instance that the
+        workers record in, like the one of the web cache, what they record is
+        merged into it.
+        """
+        self.num_processes = num_processes or multiprocessing.cpu_count()
+        self.statistics = statistics
+
+    def map (self, function, items):
+        """
+        Yields the results of calling function on every shard of items as they
+        are produced.
+        """
+        items  = list(items)
+        shards = [items[i::self.num_processes] for i in xrange(self.num_processes)]
+        shards = [shard for shard in shards if shard]
+
+        if len(shards) < 2:
+            for shard in shards:
+                yield function(shard)
+            return
+
+        logger.debug (
+            'mapping %d items over %d processes', len(items), len(shards)
+        )
+
+        ProcessPool.current = (function, shards, self.statistics)
+        workers = multiprocessing.Pool(len(shards))
+
+        try:
+            for result, stats, statistics in workers.imap_unordered(run_shard, xrange(len(shards))):
+                if stats is not None:
+                    ProcessPool.profiler.add_stats(stats)
+
+                if statistics is not None:
+                    self.statistics.merge(statistics)
+
+                yield result
+
+            workers.close()
+        finally:
+            ProcessPool.current = None
+
+            workers.terminate()
+            workers.join()
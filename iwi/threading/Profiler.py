@@ -0,0 +1,103 @@
+import cProfile
+import pstats
+import threading
+
+__all__ = ['Profiler']
+
+class Profiler (object):
+    """
+    Thread-safe collector of cProfile profiles that merges the profiles of the
+    main thread, of worker threads and of worker processes into one.
+
+    cProfile only sees the thread it is enabled in, so threads and processes
+    run their work with runcall, or send back the stats of their own profile to
+    be added with add_stats.
+    """
+    class Snapshot (object):
+        """
+        Stats of a profile made elsewhere, in the form pstats can load.
+        """
+        def __init__ (self, stats):
+            """
+            Initializes an instance from the stats of a profile.
+            """
+            self.stats = stats
+
+        def create_stats (self):
+            """
+            Does nothing, the stats are already there.
+            """
+            pass
+
+    def __init__ (self):
+        """
+        Initializes an instance with nothing collected.
+        """
+        self.main  = cProfile.Profile()
+        self.stats = None
+        self.lock  = threading.Lock()
+
+    def add (self, profile):
+        """
+        Adds a finished profile.
+        """
+        profile.create_stats()
+
+        # pstats refuses profiles without any calls
+        if not profile.stats:
+            return
+
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def add_file (self, filename):
+        """
+        Adds a profile written to a file, like by another program.
+        """
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(filename)
+            else:
+                self.stats.add(filename)
+
+    def add_stats (self, stats):
+        """
+        Adds the stats of a profile made elsewhere, like in another process.
+        """
+        self.add(Profiler.Snapshot(stats))
+
+    def enable (self):
+        """
+        Starts profiling the calling thread.
+        """
+        self.main.enable()
+
+    def disable (self):
+        """
+        Stops profiling the thread that called enable and adds its profile.
+        """
+        self.main.disable()
+        self.add(self.main)
+
+    def runcall (self, function, *args, **kwargs):
+        """
+        Calls function with args under a profile of its own, the profile is
+        added once the call returns.
+        """
+        profile = cProfile.Profile()
+
+        try:
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            self.add(profile)
+
+    def dump (self, filename):
+        """
+        Writes the merged profile to a file that pstats can read.
+        """
+        with self.lock:
+            if self.stats is not None:
+                self.stats.dump_stats(filename)
@@ -0,0 +1,126 @@
+import datetime
+import sys
+import threading
+import time
+
+__all__ = ['ProgressReporter']
+
+class ProgressReporter (threading.Thread):
+    """
+    Thread that periodically writes the progress of a run to a stream.
+
+    The progress is read from the statistics the pools and the web cache
+    record in: entities discovered and completed, which are the jobs pushed to
+    and finished by the pools, requests and megabytes per second, and an
+    estimate of the time left. Entities keep being discovered while a crawl
+    goes on, so the estimate only covers the ones known so far.
+
+    On a terminal the progress is kept on a single line that is rewritten,
+    otherwise a line is written every time so that a log file stays readable.
+    """
+    # weight of the latest rate in the smoothed rate of completed jobs
+    smoothing = 0.3
+
+    def __init__ (self, statistics, interval=5.0, stream=sys.stderr):
+        """
+        Initializes an instance from a Statistics instance, the number of
+        seconds between reports and the stream to write them to.
+        """
+        super(ProgressReporter, self).__init__()
+        self.daemon = True
+
+        self.statistics = statistics
+        self.interval   = interval
+        self.stream     = stream
+
+        self.terminal = hasattr(stream, 'isatty') and stream.isatty()
+        self.stopped  = threading.Event()
+        self.width    = 0
+
+        self.last = self.sample()
+        self.rate = None
+
+    def sample (self):
+        """
+        Returns the time along with the completed jobs, the discovered jobs,
+        the requests and the bytes received so far.
+        """
+        counters = self.statistics.statistics()['counters']
+
+        return (
+            time.time(),
+            counters.get('pool_jobs', 0),
+            counters.get('pool_pushed', 0),
+            counters.get('requests', 0),
+            counters.get('bytes_received', 0)
+        )
+
+    def line (self):
+        """
+        Returns a line describing the progress since the last one.
+        """
+        now, completed, discovered, requests, received = self.sample()
+        then, last_completed, _, last_requests, last_received = self.last
+
+        self.last = now, completed, discovered, requests, received
+        elapsed = max(now - then, 1e-6)
+
+        rate = (completed - last_completed) / elapsed
+        if self.rate is None:
+            self.rate = rate
+        else:
+            self.rate = self.smoothing * rate + (1 - self.smoothing) * self.rate
+
+        remaining = max(discovered - completed, 0)
+
+        if not remaining:
+            eta = '0:00:00'
+        elif self.rate > 0:
+            eta = str(datetime.timedelta(seconds=int(remaining / self.rate)))
+        else:
+            eta = 'unknown'
+
+        return (
+            '{}/{} entities done, {:.1f}/s, {:.1f} requests/s, {:.2f} MB/s, '
+            'ETA {}'.format (
+                completed, discovered, rate,
+                (requests - last_requests) / elapsed,
+                (received - last_received) / elapsed / 1e6,
+                eta
+            )
+        )
+
+    def report (self):
+        """
+        Writes a line describing the progress.
+        """
+        line = self.line()
+
+        if self.terminal:
+            padding = ' ' * max(self.width - len(line), 0)
+            self.width = len(line)
+            self.stream.write('\r' + line + padding)
+        else:
+            self.stream.write(line + '\n')
+
+        self.stream.flush()
+
+    def run (self):
+        """
+        Reports the progress every interval seconds until stopped.
+        """
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def stop (self):
+        """
+        Stops reporting, ending the line that is rewritten on a terminal.
+        """
+        self.stopped.set()
+
+        if self.is_alive():
+            self.join()
+
+        if self.terminal and self.width:
+            self.stream.write('\n')
+            self.stream.flush()
@@ -1 +1,5 @@
-from Pool import Pool
+from Pool             import Pool
+from AsyncPool        import AsyncPool
+from ProcessPool      import ProcessPool
+from Profiler         import Profiler
+from ProgressReporter import ProgressReporter
@@ -0,0 +1,596 @@
+import asyncore
+import collections
+import errno
+import httplib
+import Queue
+import socket
+import ssl
+import StringIO
+import sys
+import threading
+import time
+import urllib2
+import urlparse
+
+from . import Statistics
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['AsyncFetcher']
+
+class AsyncFetcher (object):
+    """
+    Single-threaded HTTP client that keeps many GET requests in flight at once
+    using non-blocking sockets.
+
+    Requests are queued with fetch and carried out while poll is called, at
+    most concurrency requests are in flight at any time. Connections are kept
+    alive and reused for later requests to the same host, idle connections are
+    closed after a while. Host names are resolved on threads of their own so
+    that the event loop never waits on a lookup.
+    """
+    # how many redirects to follow before giving up
+    max_redirects = 5
+
+    redirect_codes = (301, 302, 303, 307, 308)
+
+    # seconds a request may take when no timeout and no socket default is set
+    default_timeout = 60.0
+
+    class FakeSocket (object):
+        """
+        Wraps a received response so that httplib can parse it.
+        """
+        def __init__ (self, data):
+            """
+            Initializes an instance from the raw response.
+            """
+            self.data = data
+
+        def makefile (self, *ignored):
+            """
+            Returns a file-like object over the raw response.
+            """
+            return StringIO.StringIO(self.data)
+
+    class Channel (asyncore.dispatcher):
+        """
+        A connection to a host that carries one request at a time.
+        """
+        def __init__ (self, fetcher, key, family, address):
+            """
+            Initializes an instance from a parent fetcher, the scheme and host
+            it connects to and their resolved address, and starts connecting.
+            """
+            asyncore.dispatcher.__init__(self, map=fetcher.channels)
+
+            self.fetcher = fetcher
+            self.key     = key
+            self.request = None
+            self.reused  = False
+
+            self.outgoing = ''
+            self.incoming = []
+
+            scheme, netloc = key
+
+            self.hostname = urlparse.urlparse('//' + netloc).hostname
+            self.secure = scheme == 'https'
+            self.handshaking = False
+            self.finished = True
+            self.deadline = None
+            self.last_used = time.time()
+
+            self.create_socket(family, socket.SOCK_STREAM)
+
+            try:
+                self.connect(address)
+            except Exception:
+                self.close()
+                raise
+
+        def send_request (self, request, reused=False):
+            """
+            Starts sending a request, reused tells whether the connection has
+            carried requests before.
+            """
+            url, headers, _, timeout, _ = request
+            parsed = urlparse.urlparse(url)
+
+            path = parsed.path or '/'
+            if parsed.query:
+                path += '?' + parsed.query
+
+            lines = ['GET {} HTTP/1.1'.format(path)]
+            lines.append('Host: {}'.format(parsed.netloc))
+            lines.append('Accept-Encoding: identity')
+            lines.extend('{}: {}'.format(*header) for header in headers.items())
+
+            self.request  = request
+            self.reused   = reused
+            self.outgoing = '\r\n'.join(lines) + '\r\n\r\n'
+            self.incoming = []
+            self.received = 0
+            self.finished = False
+
+            # where the body starts and ends, and how far chunks were scanned
+            self.body_start = None
+            self.body_end   = None
+            self.chunked    = None
+
+            if timeout is socket._GLOBAL_DEFAULT_TIMEOUT:
+                timeout = socket.getdefaulttimeout()
+
+            if timeout is None:
+                timeout = self.fetcher.default_timeout
+
+            self.deadline = time.time() + timeout
+
+        def readable (self):
+            """
+            Returns whether the channel wants to read.
+            """
+            return True
+
+        def writable (self):
+            """
+            Returns whether the channel wants to write.
+            """
+            return (
+                not self.connected or self.handshaking or bool(self.outgoing)
+            )
+
+        def handshake (self):
+            """
+            Advances the TLS handshake.
+            """
+            try:
+                self.socket.do_handshake()
+                self.handshaking = False
+            except ssl.SSLError as e:
+                if e.args[0] not in (ssl.SSL_ERROR_WANT_READ,
+                                     ssl.SSL_ERROR_WANT_WRITE):
+                    raise
+
+        def handle_connect (self):
+            """
+            Starts the TLS handshake on secure connections.
+            """
+            if self.secure:
+                context = ssl.create_default_context()
+                self.del_channel()
+                self.set_socket (
+                    context.wrap_socket (
+                        self.socket,
+                        server_hostname=self.hostname,
+                        do_handshake_on_connect=False
+                    ),
+                    self.fetcher.channels
+                )
+                self.handshaking = True
+                self.handshake()
+
+        def handle_read (self):
+            """
+            Reads whatever is available and completes the request once the
+            whole response is in.
+            """
+            if self.handshaking:
+                return self.handshake()
+
+            try:
+                data = self.recv(65536)
+
+                while data and self.secure and self.socket.pending():
+                    self.incoming.append(data)
+                    self.received += len(data)
+                    data = self.recv(self.socket.pending())
+            except ssl.SSLError as e:
+                if e.args[0] == ssl.SSL_ERROR_WANT_READ:
+                    return
+                raise
+
+            if data:
+                self.incoming.append(data)
+                self.received += len(data)
+
+            if self.request is None:
+                # nothing is expected on an idle connection
+                if self.incoming:
+                    self.close()
+                return
+
+            end = self.response_end()
+
+            if end is not None:
+                self.parse(end)
+
+        def handle_write (self):
+            """
+            Writes as much of the request as possible.
+            """
+            if self.handshaking:
+                return self.handshake()
+
+            try:
+                sent = self.send(self.outgoing)
+            except ssl.SSLError as e:
+                if e.args[0] == ssl.SSL_ERROR_WANT_WRITE:
+                    return
+                raise
+
+            self.outgoing = self.outgoing[sent:]
+
+        def response_end (self):
+            """
+            Returns where the response ends in the data received so far, or
+            None if it is not complete or only ends when the server closes the
+            connection.
+            """
+            if self.body_end is not None:
+                return self.body_end if self.received >= self.body_end else None
+
+            data = ''.join(self.incoming)
+            self.incoming = [data]
+
+            if self.body_start is None:
+                head = data.find('\r\n\r\n')
+
+                if head < 0:
+                    return None
+
+                self.body_start = head + 4
+
+                lines   = data[:head].split('\r\n')
+                status  = int(lines[0].split(None, 2)[1])
+                headers = {}
+
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                if status in (204, 304) or 100 <= status < 200:
+                    self.body_end = self.body_start
+                elif 'chunked' in headers.get('transfer-encoding', '').lower():
+                    self.chunked = self.body_start
+                elif 'content-length' in headers:
+                    self.body_end = (
+                        self.body_start + int(headers['content-length'])
+                    )
+                else:
+                    return None
+
+                if self.body_end is not None:
+                    return self.response_end()
+
+            if self.chunked is None:
+                return None
+
+            while True:
+                line_end = data.find('\r\n', self.chunked)
+
+                if line_end < 0:
+                    return None
+
+                size = int(data[self.chunked:line_end].split(';')[0], 16)
+
+                if not size:
+                    # the last chunk, trailers end with an empty line
+                    end = data.find('\r\n\r\n', line_end)
+                    return None if end < 0 else end + 4
+
+                if line_end + size + 4 > len(data):
+                    return None
+
+                self.chunked = line_end + size + 4
+
+        def parse (self, end=None):
+            """
+            Parses the response received so far, or up to end if given, and
+            completes the request.
+            """
+            data = ''.join(self.incoming)
+            self.incoming = []
+
+            if end is not None and end != len(data):
+                # more than one response, this is not to be trusted
+                return self.fail(httplib.BadStatusLine(data[end:end + 64]))
+
+            try:
+                response = httplib.HTTPResponse(AsyncFetcher.FakeSocket(data))
+                response.begin()
+                contents = response.read()
+            except Exception as e:
+                return self.fail(e)
+
+            self.finished = True
+            self.fetcher.complete (
+                self, None, response, contents,
+                keep=end is not None and not response.will_close
+            )
+
+        def handle_close (self):
+            """
+            Parses the response once the server has closed the connection.
+            """
+            self.close()
+
+            if self.finished:
+                return self.fetcher.discard(self)
+
+            if not self.received:
+                return self.fail(httplib.BadStatusLine(''))
+
+            self.parse()
+
+        def handle_error (self):
+            """
+            Fails the request on any exception raised while handling events.
+            """
+            _, error, _ = sys.exc_info()
+            self.fail(error)
+
+        def fail (self, error):
+            """
+            Closes the connection and reports the error, a request on a reused
+            connection the server dropped before answering is retried instead.
+            """
+            self.close()
+
+            if self.finished:
+                return self.fetcher.discard(self)
+
+            self.finished = True
+
+            if self.reused and not self.received and (
+                isinstance(error, httplib.BadStatusLine) or
+                getattr(error, 'errno', None) in (errno.ECONNRESET,
+                                                  errno.EPIPE)
+            ):
+                logger.debug('reconnecting to %s after %r', self.key[1], error)
+                return self.fetcher.retry(self)
+
+            self.fetcher.complete(self, error, None, None)
+
+    def __init__ (self, concurrency=64, idle_timeout=30.0, statistics=None):
+        """
+        Initializes an instance from the number of requests to keep in flight,
+        the number of seconds an idle connection is kept around and an
+        optional Statistics instance to count connections in.
+        """
+        self.concurrency  = concurrency
+        self.idle_timeout = idle_timeout
+
+        if statistics is None:
+            self.statistics = Statistics()
+        else:
+            self.statistics = statistics
+
+        self.channels = {}
+        self.pending  = collections.deque()
+        self.inflight = set()
+        self.idle     = {}
+
+        # requests waiting on a lookup, by host and port
+        self.waiting   = {}
+        self.resolved  = Queue.Queue()
+        self.addresses = {}
+
+    def __len__ (self):
+        """
+        Returns the number of requests that are queued or in flight.
+        """
+        return (
+            len(self.pending) + len(self.inflight) +
+            sum(map(len, self.waiting.values()))
+        )
+
+    def resolve (self, host, port):
+        """
+        Starts resolving the address of a host on a thread of its own, the
+        outcome is picked up by poll.
+        """
+        def work ():
+            try:
+                family, _, _, _, address = socket.getaddrinfo (
+                    host, port, 0, socket.SOCK_STREAM
+                )[0]
+            except Exception as e:
+                self.resolved.put(((host, port), e, None))
+            else:
+                self.resolved.put(((host, port), None, (family, address)))
+
+        logger.debug('resolving %s', host)
+
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+
+    def fetch (self, url, headers, callback, timeout=None):
+        """
+        Queues a GET request.
+
+        The callback is called from poll with an error, a response and its
+        body. The error is None on success, responses with error codes are
+        reported as urllib2.HTTPError like urllib2.urlopen raises them.
+        """
+        self.pending.append((url, headers, callback, timeout, 0))
+
+    def start (self):
+        """
+        Starts queued requests while there is room for them, on an idle
+        connection to their host if there is one.
+        """
+        waiting = sum(map(len, self.waiting.values()))
+
+        while self.pending and len(self.inflight) + waiting < self.concurrency:
+            request = self.pending.popleft()
+            parsed  = urlparse.urlparse(request[0])
+            key     = parsed.scheme, parsed.netloc
+
+            if parsed.scheme not in ('http', 'https'):
+                self.finish (
+                    request,
+                    urllib2.URLError('unknown url type: ' + parsed.scheme),
+                    None, None
+                )
+                continue
+
+            idle = self.idle.get(key)
+
+            if idle:
+                channel = idle.pop()
+                channel.send_request(request, reused=True)
+
+                self.statistics.count('connections_reused')
+                self.inflight.add(channel)
+                continue
+
+            host = parsed.hostname, parsed.port or (
+                443 if parsed.scheme == 'https' else 80
+            )
+
+            if host not in self.addresses:
+                if host not in self.waiting:
+                    self.waiting[host] = []
+                    self.resolve(*host)
+
+                self.waiting[host].append(request)
+                waiting += 1
+                continue
+
+            try:
+                channel = AsyncFetcher.Channel (
+                    self, key, *self.addresses[host]
+                )
+            except Exception as e:
+                self.finish(request, e, None, None)
+                continue
+
+            logger.debug('connecting to %s://%s', *key)
+            channel.send_request(request)
+
+            self.statistics.count('connections_opened')
+            self.inflight.add(channel)
+
+    def lookups (self):
+        """
+        Requeues the requests whose host has been resolved, and fails them if
+        it could not be.
+        """
+        while True:
+            try:
+                host, error, address = self.resolved.get_nowait()
+            except Queue.Empty:
+                return
+
+            requests = self.waiting.pop(host, [])
+
+            if error is not None:
+                for request in requests:
+                    self.finish(request, error, None, None)
+                continue
+
+            self.addresses[host] = address
+            self.pending.extendleft(reversed(requests))
+
+    def complete (self, channel, error, response, contents, keep=False):
+        """
+        Called by a channel when its request is done, keep tells whether the
+        connection may carry another request.
+        """
+        self.inflight.discard(channel)
+        request, channel.request = channel.request, None
+
+        if keep:
+            channel.last_used = time.time()
+            self.idle.setdefault(channel.key, []).append(channel)
+        else:
+            channel.close()
+
+        self.finish(request, error, response, contents)
+
+    def retry (self, channel):
+        """
+        Called by a channel whose request is to be made again on another
+        connection.
+        """
+        self.inflight.discard(channel)
+        request, channel.request = channel.request, None
+
+        self.pending.appendleft(request)
+
+    def discard (self, channel):
+        """
+        Forgets an idle channel the server has closed.
+        """
+        idle = self.idle.get(channel.key, [])
+
+        if channel in idle:
+            idle.remove(channel)
+
+    def finish (self, request, error, response, contents):
+        """
+        Follows redirects, converts error codes and calls back.
+        """
+        url, headers, callback, timeout, redirects = request
+
+        if error is None and response.status >= 300:
+            location = response.getheader('location')
+
+            if (response.status in self.redirect_codes and location and
+                redirects < self.max_redirects):
+                self.pending.append ((
+                    urlparse.urljoin(url, location),
+                    headers, callback, timeout, redirects + 1
+                ))
+                return
+
+            error = urllib2.HTTPError (
+                url, response.status, response.reason, response.msg, None
+            )
+
+        callback(error, response, contents)
+
+    def poll (self, timeout=0.0):
+        """
+        Waits at most timeout seconds for network events and handles them.
+        """
+        self.lookups()
+        self.start()
+
+        if self.channels:
+            asyncore.loop (
+                timeout=timeout, use_poll=True,
+                map=self.channels, count=1
+            )
+        elif timeout:
+            time.sleep(timeout)
+
+        now = time.time()
+
+        for channel in list(self.inflight):
+            if channel.deadline < now:
+                channel.fail(socket.timeout('timed out'))
+
+        for idle in self.idle.values():
+            for channel in list(idle):
+                if now - channel.last_used > self.idle_timeout:
+                    logger.debug('evicting idle connection to %s', channel.key[1])
+                    idle.remove(channel)
+                    channel.close()
+
+        self.lookups()
+        self.start()
+
+    def close (self):
+        """
+        Closes every idle connection.
+        """
+        for idle in self.idle.values():
+            for channel in idle:
+                channel.close()
+
+        self.idle.clear()
@@ -0,0 +1,471 @@
+import os
+import re
+import struct
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['CacheStore']
+
+class CacheStore (object):
+    """
+    Indexed, append-only on-disk store for cache entries.
+
+    Every entry is a (lastmodified, contents) pair stored under a key. The
+    contents are appended to numbered segment files next to the index file
+    and only the small key index is kept in memory, contents are read from
+    disk on demand.
+
+    The index file itself lives at the given path, segments are named
+    <path>.0000, <path>.0001, ... Compaction writes a new generation of
+    segments, named <path>.g1.0000, ... for generation 1, and switches the
+    index over to it at once.
+
+    Access is not thread-safe, the WebCache serializes access to its store.
+    """
+    magic = 'IWICACHE\x01'
+
+    # record header, key length, lastmodified length and contents length
+    record_header = struct.Struct('<HHI')
+
+    # lastmodified length used to represent a missing lastmodified value
+    no_lastmodified = 0xffff
+
+    # segments are rolled over once they grow past this many bytes
+    segment_size = 256 * 1024 * 1024
+
+    def __init__ (self, path):
+        """
+        Initializes an instance from a path to an index file.
+
+        If the path contains a cache in the old single-pickle format it is
+        migrated to the new format, the old file is kept with a '.pickle'
+        suffix.
+        If there is nothing at the path the store is initialized to be empty,
+        save for records found in segments left behind.
+        """
+        self.path = path
+
+        self.index = {}
+        self.sizes = []
+
+        self.readers = {}
+        self.writer  = None
+
+        # process the files were opened in, see detach
+        self.pid = os.getpid()
+
+        self.dirty = False
+
+        # generation of the segments the index refers to
+        self.generation = 0
+
+        if os.path.exists(self.path) and self.is_legacy(self.path):
+            self.migrate()
+        else:
+            self.read_index()
+
+    def __contains__ (self, key):
+        """
+        x.__contains__(y) <==> y in x
+        """
+        return key in self.index
+
+    def __delitem__ (self, key):
+        """
+        x.__delitem__(y) <==> del x[y]
+
+        Only the index entry is removed, the contents stay in the segment until
+        the store is compacted.
+        """
+        del self.index[key]
+        self.dirty = True
+
+    def __getitem__ (self, key):
+        """
+        x.__getitem__(y) <==> x[y]
+        """
+        lastmodified, segment, offset, length = self.index[key]
+        return lastmodified, self.read(segment, offset, length)
+
+    def __iter__ (self):
+        """
+        x.__iter__() <==> iter(x)
+        """
+        return iter(self.index.keys())
+
+    def __len__ (self):
+        """
+        x.__len__() <==> len(x)
+        """
+        return len(self.index)
+
+    def __setitem__ (self, key, values):
+        """
+        x.__setitem__(i, y) <==> x[i]=y
+
+        The values must be a (lastmodified, contents) pair, the contents are
+        appended to the current segment.
+        """
+        lastmodified, contents = values
+        self.index[key] = (lastmodified,) + self.append (
+            key, lastmodified, contents
+        )
+        self.dirty = True
+
+    @classmethod
+    def is_legacy (cls, path):
+        """
+        Returns whether the file at path is a cache in the old single-pickle
+        format.
+        """
+        with open(path, 'rb') as infile:
+            return infile.read(len(cls.magic)) != cls.magic
+
+    def segment_path (self, segment, generation=None):
+        """
+        Returns the path to a numbered segment of a generation, by default of
+        the current one.
+        """
+        if generation is None:
+            generation = self.generation
+
+        if not generation:
+            return '{}.{:04d}'.format(self.path, segment)
+
+        return '{}.g{}.{:04d}'.format(self.path, generation, segment)
+
+    def stale_segments (self):
+        """
+        Returns the paths to segments of other generations than the current
+        one, left behind by a compaction that was interrupted.
+        """
+        directory, name = os.path.split(os.path.abspath(self.path))
+        pattern = re.compile(re.escape(name) + r'\.(?:g(\d+)\.)?\d{4,}$')
+
+        stale = []
+
+        for filename in os.listdir(directory):
+            match = pattern.match(filename)
+
+            if match and int(match.group(1) or 0) != self.generation:
+                stale.append(os.path.join(directory, filename))
+
+        return stale
+
+    def append (self, key, lastmodified, contents):
+        """
+        Appends a record to the current segment, rolling over to a new segment
+        if the current one is full.
+
+        Returns a (segment, offset, length) triple locating the contents.
+        """
+        if not self.sizes or self.sizes[-1] >= self.segment_size:
+            self.roll_over()
+
+        segment = len(self.sizes) - 1
+
+        if self.writer is None:
+            self.writer = self.open_writer(segment)
+
+        if lastmodified is None:
+            lastmodified, lm_length = '', self.no_lastmodified
+        else:
+            lm_length = len(lastmodified)
+
+        self.writer.write (
+            self.record_header.pack(len(key), lm_length, len(contents))
+        )
+        self.writer.write(key)
+        self.writer.write(lastmodified)
+        self.writer.write(contents)
+
+        offset = (
+            self.sizes[-1] + self.record_header.size +
+            len(key) + len(lastmodified)
+        )
+        self.sizes[-1] = offset + len(contents)
+
+        return segment, offset, len(contents)
+
+    def open_writer (self, segment):
+        """
+        Opens a segment for appending.
+
+        Bytes past the indexed and recovered size are a torn write and are cut
+        off first. Only the writer does this, readers just ignore them, as they
+        may be a record another process has not finished yet.
+        """
+        path = self.segment_path(segment)
+
+        if os.path.exists(path) and os.path.getsize(path) > self.sizes[segment]:
+            logger.warning('cutting off a torn write in %s', path)
+
+            with open(path, 'r+b') as outfile:
+                outfile.truncate(self.sizes[segment])
+
+        return open(path, 'ab')
+
+    def roll_over (self):
+        """
+        Closes the current segment and starts a new one.
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+        self.sizes.append(0)
+        logger.debug('starting segment %s', self.segment_path(len(self.sizes)-1))
+
+    def detach (self):
+        """
+        Lets go of the files opened by the parent in a forked process, which
+        would otherwise share their offsets and write buffers with it.
+
+        The files are kept referenced so that they are never flushed or closed
+        by the forked process.
+        """
+        if self.pid == os.getpid():
+            return
+
+        self.inherited = self.readers, self.writer
+
+        self.readers = {}
+        self.writer  = None
+        self.pid     = os.getpid()
+
+    def read (self, segment, offset, length):
+        """
+        Reads length bytes at offset from a segment.
+        """
+        self.detach()
+
+        if self.writer is not None:
+            self.writer.flush()
+
+        if segment not in self.readers:
+            self.readers[segment] = open(self.segment_path(segment), 'rb')
+
+        reader = self.readers[segment]
+        reader.seek(offset)
+
+        return reader.read(length)
+
+    def scan (self, segment, offset=0):
+        """
+        Yields (key, lastmodified, offset, length) for every complete record
+        in a segment starting at offset.
+        """
+        with open(self.segment_path(segment), 'rb') as infile:
+            infile.seek(offset)
+
+            while True:
+                header = infile.read(self.record_header.size)
+                if len(header) < self.record_header.size:
+                    break
+
+                key_length, lm_length, length = self.record_header.unpack (
+                    header
+                )
+
+                key = infile.read(key_length)
+
+                if lm_length == self.no_lastmodified:
+                    lastmodified = None
+                else:
+                    lastmodified = infile.read(lm_length)
+
+                offset = infile.tell()
+                infile.seek(length, os.SEEK_CUR)
+
+                if infile.tell() > os.fstat(infile.fileno()).st_size:
+                    break
+
+                yield key, lastmodified, offset, length
+
+    def read_index (self):
+        """
+        Reads the index file if there is one and recovers records appended
+        after the index was last written.
+        """
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as infile:
+                infile.read(len(self.magic))
+                state = pickle.load(infile)
+
+            # indexes of stores never compacted carry no generation
+            if len(state) == 3:
+                self.sizes, self.index, self.generation = state
+            else:
+                self.sizes, self.index = state
+
+        # segments started after the index was last written
+        while os.path.exists(self.segment_path(len(self.sizes))):
+            self.sizes.append(0)
+
+        for segment, size in enumerate(self.sizes):
+            path = self.segment_path(segment)
+
+            if not os.path.exists(path) or os.path.getsize(path) <= size:
+                continue
+
+            logger.warning('recovering unindexed records in %s', path)
+
+            for key, lastmodified, offset, length in self.scan(segment, size):
+                self.index[key] = (lastmodified, segment, offset, length)
+                self.sizes[segment] = offset + length
+
+            self.dirty = True
+
+    def write_index (self, path=None):
+        """
+        Atomically writes the index to path, defaults to the index path.
+        """
+        path = path or self.path
+        temporary = path + '.tmp'
+
+        if self.generation:
+            state = self.sizes, self.index, self.generation
+        else:
+            state = self.sizes, self.index
+
+        with open(temporary, 'wb') as outfile:
+            outfile.write(self.magic)
+            pickle.dump(state, outfile, protocol=-1)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+
+        os.rename(temporary, path)
+
+    def flush (self):
+        """
+        Flushes appended records and writes the index if anything changed.
+        """
+        if self.writer is not None:
+            self.writer.flush()
+            os.fsync(self.writer.fileno())
+
+        if self.dirty:
+            logger.debug('writing index %s', self.path)
+            self.write_index()
+            self.dirty = False
+
+    def close (self):
+        """
+        Flushes the store and closes every open segment.
+        """
+        self.flush()
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
+
+    def compact (self):
+        """
+        Rewrites the live entries into a new generation of segments,
+        reclaiming space taken by overwritten and removed entries.
+
+        The index is switched over to the new segments in one rename and the
+        old ones are removed only then, so an interrupted compaction leaves
+        either the old or the new generation in use, and its leftovers are
+        removed by the next one.
+        """
+        logger.info('compacting %s', self.path)
+
+        self.flush()
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
+
+        for path in self.stale_segments():
+            os.remove(path)
+
+        old_generation = self.generation
+        old_index = self.index
+        old_readers = {}
+
+        self.generation += 1
+        self.sizes = []
+        self.index = {}
+
+        try:
+            for key, (lastmodified, segment, offset, length) in old_index.iteritems():
+                if segment not in old_readers:
+                    old_readers[segment] = open (
+                        self.segment_path(segment, old_generation), 'rb'
+                    )
+
+                reader = old_readers[segment]
+                reader.seek(offset)
+
+                self.index[key] = (lastmodified,) + self.append (
+                    key, lastmodified, reader.read(length)
+                )
+        finally:
+            for reader in old_readers.values():
+                reader.close()
+
+        self.dirty = True
+        self.flush()
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+        for path in self.stale_segments():
+            os.remove(path)
+
+    def lastmodified (self, key):
+        """
+        Returns the lastmodified value of an entry without reading its
+        contents.
+        """
+        return self.index[key][0]
+
+    def migrate (self):
+        """
+        Migrates a cache in the old single-pickle format at the index path to
+        the new format, keeping the old file with a '.pickle' suffix.
+        """
+        legacy = self.path + '.pickle'
+
+        logger.warning('migrating old cache %s, keeping it as %s', self.path, legacy)
+
+        with open(self.path, 'rb') as infile:
+            cache = pickle.load(infile)
+
+        os.rename(self.path, legacy)
+
+        for key, values in cache.iteritems():
+            self[key] = values
+
+        self.flush()
+
+    def keys (self):
+        """
+        Makes a copy of the list of keys and returns it.
+        """
+        return self.index.keys()
+
+    def update (self, other):
+        """
+        Copies every entry of a mapping of keys to (lastmodified, contents)
+        pairs into the store.
+        """
+        for key in other.keys():
+            self[key] = other[key]
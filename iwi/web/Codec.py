@@ -0,0 +1,228 @@
+import importlib
+import threading
+import zlib
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['Codec']
+
+# strings that recur in the JSON of the 4chan API, the ones found in almost
+# every post last since deflate finds close matches cheaper than far ones
+dictionary = ''.join ((
+    '{"boards":[{"board":"","title":"","ws_board":1,"per_page":15,"pages":10,'
+    '"max_filesize":4194304,"max_webm_filesize":3145728,'
+    '"max_comment_chars":2000,"bump_limit":300,"image_limit":150,'
+    '"cooldowns":{"threads":600,"replies":60,"images":60},'
+    '"meta_description":"","is_archived":1}]}',
+    '"sticky":1,"closed":1,"archived":1,"archived_on":',
+    '"capcode":"mod","capcode":"admin","since4pass":',
+    '"filedeleted":1,"spoiler":1,"custom_spoiler":',
+    '"omitted_posts":', '"omitted_images":',
+    '"bumplimit":0,"imagelimit":0,"unique_ips":',
+    '"tag":"","board_flag":"","flag_name":"',
+    '"country":"US","country_name":"United States"',
+    '"country":"GB","country_name":"United Kingdom"',
+    '[{"page":1,"threads":[{"no":', '"last_modified":',
+    '{"threads":[{"posts":[', '"semantic_url":"',
+    '<pre class=\\"prettyprint\\">', '</pre>',
+    '<span class=\\"deadlink\\">&gt;&gt;', '<s>', '</s>', '<wbr>',
+    '&#039;', '&quot;', '&amp;', '&lt;', '&gt;',
+    '"ext":".webm"', '"ext":".gif"', '"ext":".png"', '"ext":".jpg"',
+    '"filename":"', '"fsize":', '"md5":"', '==",',
+    '"w":', '"h":', '"tn_w":', '"tn_h":', '"tim":',
+    '"sub":"', '"replies":', '"images":', '"id":"',
+    '"trip":"!!', '"trip":"!',
+    '(Sun)', '(Sat)', '(Fri)', '(Thu)', '(Wed)', '(Tue)', '(Mon)',
+    '<span class=\\"quote\\">&gt;', '</span><br>',
+    '<a href=\\"#p', '\\" class=\\"quotelink\\">&gt;&gt;', '</a><br>',
+    '<br><br>',
+    '"now":"', '"now":"10\\/17\\/16', '"time":', '"resto":0,',
+    '"com":"', '"name":"Anonymous",',
+    '},{"no":', '"resto":',
+))
+
+# preset dictionaries of the zlib-dict codec by the tag of the entries made
+# with them, a dictionary must not change once entries were made with it, a
+# better one is added under a tag of its own, from '\x10' up, and made the one
+# new entries are compressed with while the old ones still decompress theirs
+dictionaries = {
+    '\x01' : dictionary
+}
+
+class Codec (object):
+    """
+    Thread-safe compressor of cache entries with pluggable codecs.
+
+    Entries are compressed with the codec and level set, and decompressed
+    with the codec they were compressed with, so a cache may hold entries of
+    several codecs. Plain zlib entries are written as they always were, every
+    other codec writes a tag byte first that zlib output never starts with.
+
+    The zlib-dict codec primes zlib with a preset dictionary of strings found
+    in the JSON of the 4chan API, which mostly pays off for small entries. Its
+    tag tells which of the dictionaries an entry was compressed with.
+    """
+    # codecs by name, as the tag of their entries and the module they need,
+    # zlib-dict tags new entries with the tag of its newest dictionary
+    codecs = {
+        'zlib'      : ('x',    'zlib'),
+        'stored'    : ('\x00', None),
+        'zlib-dict' : ('\x01', 'zlib'),
+        'bz2'       : ('\x02', 'bz2'),
+        'lzma'      : ('\x03', 'backports.lzma'),
+        'lz4'       : ('\x04', 'lz4.block')
+    }
+
+    # what the codecs that take a level use without one
+    default_levels = {
+        'zlib'      : 6,
+        'zlib-dict' : 6,
+        'bz2'       : 9,
+        'lzma'      : 6
+    }
+
+    # lowest and highest level the codecs that take one accept
+    levels = {
+        'zlib'      : (0, 9),
+        'zlib-dict' : (0, 9),
+        'bz2'       : (1, 9),
+        'lzma'      : (0, 9)
+    }
+
+    def __init__ (self, name='zlib', level=None):
+        """
+        Initializes an instance from the name of a codec and an optional
+        level, see set_codec.
+        """
+        self.lock = threading.Lock()
+        self.compressors = {}
+        self.decompressors = {}
+
+        self.set_codec(name, level)
+
+    @classmethod
+    def available (cls):
+        """
+        Returns the names of the codecs whose modules can be imported.
+        """
+        names = []
+
+        for name, (_, module) in sorted(cls.codecs.items()):
+            if module is not None:
+                try:
+                    importlib.import_module(module)
+                except ImportError:
+                    continue
+
+            names.append(name)
+
+        return names
+
+    def set_codec (self, name='zlib', level=None):
+        """
+        Switches the codec new entries are compressed with, level is the
+        compression level of codecs that take one and by default their own
+        default.
+
+        Raises ValueError for an unknown codec, or for a level the codec does
+        not accept or that is given to a codec that takes none.
+        """
+        if name not in self.codecs:
+            raise ValueError ('unknown codec {}'.format(name))
+
+        if level is not None:
+            if name not in self.levels:
+                raise ValueError ('the {} codec takes no level'.format(name))
+
+            lower, upper = self.levels[name]
+
+            if not lower <= level <= upper:
+                raise ValueError (
+                    'the level of the {} codec must be between {} and {}'.format (
+                        name, lower, upper
+                    )
+                )
+
+        self.tag, module = self.codecs[name]
+
+        if module is not None:
+            self.module = importlib.import_module(module)
+
+        self.name  = name
+        self.level = self.default_levels.get(name) if level is None else level
+
+        logger.debug('compressing with %s at level %s', name, self.level)
+
+    def primed (self, level, tag):
+        """
+        Returns a zlib compressor at level that has seen the preset
+        dictionary of a tag, along with the output it made for it.
+        """
+        with self.lock:
+            if (tag, level) not in self.compressors:
+                compressor = zlib.compressobj(level)
+                prefix = compressor.compress(dictionaries[tag])
+                prefix += compressor.flush(zlib.Z_SYNC_FLUSH)
+
+                self.compressors[tag, level] = compressor, prefix
+
+            return self.compressors[tag, level]
+
+    def compress (self, data):
+        """
+        Returns data compressed with the codec set.
+        """
+        if self.name == 'zlib':
+            return zlib.compress(data, self.level)
+
+        if self.name == 'stored':
+            return self.tag + data
+
+        if self.name == 'zlib-dict':
+            compressor = self.primed(self.level, self.tag)[0].copy()
+            return self.tag + compressor.compress(data) + compressor.flush()
+
+        if self.name == 'bz2':
+            return self.tag + self.module.compress(data, self.level)
+
+        if self.name == 'lzma':
+            return self.tag + self.module.compress(data, preset=self.level)
+
+        return self.tag + self.module.compress(data)
+
+    def decompress (self, data):
+        """
+        Returns the contents of an entry compressed with any codec, data may
+        be a string or a buffer, raises ValueError if the entry is not of a
+        known codec or zlib.error if it is corrupt.
+        """
+        tag = data[:1]
+
+        if tag == 'x':
+            return zlib.decompress(data)
+
+        data = buffer(data, 1)
+
+        if tag == '\x00':
+            return str(data)
+
+        if tag in dictionaries:
+            # the window is what counts, not the level it was compressed at
+            _, prefix = self.primed(self.default_levels['zlib-dict'], tag)
+
+            with self.lock:
+                if tag not in self.decompressors:
+                    self.decompressors[tag] = zlib.decompressobj()
+                    self.decompressors[tag].decompress(prefix)
+
+                decompressor = self.decompressors[tag].copy()
+
+            return decompressor.decompress(data) + decompressor.flush()
+
+        for other, module in self.codecs.values():
+            if tag == other:
+                return importlib.import_module(module).decompress(str(data))
+
+        raise ValueError ('unknown codec tag {!r}'.format(tag))
@@ -0,0 +1,208 @@
+import errno
+import httplib
+import socket
+import threading
+import time
+import urllib2
+import urlparse
+
+from . import Statistics
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['ConnectionPool']
+
+class ConnectionPool (object):
+    """
+    Thread-safe per-host pool of persistent HTTP/1.1 connections.
+
+    Connections are handed out to one request at a time and put back when the
+    response has been read, idle connections are evicted after a while. Only
+    idle connections are capped, there are as many connections in use as
+    there are threads making requests.
+    """
+    # connection classes by scheme
+    connection_classes = {
+        'http'  : httplib.HTTPConnection,
+        'https' : httplib.HTTPSConnection
+    }
+
+    # how many redirects to follow before giving up
+    max_redirects = 5
+
+    redirect_codes = (301, 302, 303, 307, 308)
+
+    # seconds a request may take when no timeout and no socket default is set
+    default_timeout = 60.0
+
+    def __init__ (self, max_size=16, idle_timeout=30.0, statistics=None):
+        """
+        Initializes an instance from the number of idle connections to keep per
+        host, the number of seconds an idle connection is kept around and an
+        optional Statistics instance to record the stages of requests in.
+        """
+        self.max_size     = max_size
+        self.idle_timeout = idle_timeout
+
+        if statistics is None:
+            self.statistics = Statistics()
+        else:
+            self.statistics = statistics
+
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def acquire (self, scheme, netloc, timeout):
+        """
+        Returns an idle connection to the host if there is one, otherwise a new
+        connection, along with whether the connection was reused.
+
+        Either way the connection times out after timeout seconds, or after
+        the socket default or default_timeout if timeout is the default.
+        Raises urllib2.URLError if the scheme is not supported.
+        """
+        if scheme not in self.connection_classes:
+            raise urllib2.URLError('unknown url type: {}'.format(scheme))
+
+        if timeout is socket._GLOBAL_DEFAULT_TIMEOUT:
+            timeout = socket.getdefaulttimeout()
+
+        if timeout is None:
+            timeout = self.default_timeout
+
+        now = time.time()
+
+        with self.lock:
+            idle = self.idle.get((scheme, netloc), [])
+
+            while idle:
+                connection, last_used = idle.pop()
+
+                if now - last_used > self.idle_timeout:
+                    logger.debug('evicting idle connection to %s', netloc)
+                    connection.close()
+                    continue
+
+                # also used should httplib have to connect again
+                connection.timeout = timeout
+
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+
+                return connection, True
+
+        logger.debug('connecting to %s://%s', scheme, netloc)
+        return self.connection_classes[scheme](netloc, timeout=timeout), False
+
+    def release (self, scheme, netloc, connection):
+        """
+        Puts a connection back in the pool, the connection is closed if the
+        pool for the host is full.
+        """
+        with self.lock:
+            idle = self.idle.setdefault((scheme, netloc), [])
+
+            if len(idle) < self.max_size:
+                idle.append((connection, time.time()))
+                return
+
+        connection.close()
+
+    def close (self):
+        """
+        Closes every idle connection.
+        """
+        with self.lock:
+            for idle in self.idle.values():
+                for connection, _ in idle:
+                    connection.close()
+
+            self.idle.clear()
+
+    def fetch (self, scheme, netloc, path, headers, timeout):
+        """
+        Performs a GET request on a pooled connection and returns the response
+        and its body.
+
+        If a reused connection turns out to have been closed by the server the
+        request is transparently retried on a new connection.
+
+        The time spent connecting (name lookup included), waiting for the
+        response and reading the body is recorded in the statistics.
+        """
+        statistics = self.statistics
+
+        while True:
+            connection, reused = self.acquire(scheme, netloc, timeout)
+            statistics.count (
+                'connections_reused' if reused else 'connections_opened'
+            )
+
+            try:
+                if not reused:
+                    with statistics.timer('connect'):
+                        connection.connect()
+
+                with statistics.timer('wait'):
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+
+                with statistics.timer('transfer'):
+                    contents = response.read()
+            except (httplib.BadStatusLine, socket.error) as e:
+                connection.close()
+
+                if reused and (
+                    isinstance(e, httplib.BadStatusLine) or
+                    e.errno in (errno.ECONNRESET, errno.EPIPE)
+                ):
+                    logger.debug('reconnecting to %s after %r', netloc, e)
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self.release(scheme, netloc, connection)
+
+            return response, contents
+
+    def request (self, url, headers, timeout=socket._GLOBAL_DEFAULT_TIMEOUT):
+        """
+        Performs a GET request on the URL, following redirects.
+
+        Returns the response and its body, responses with error codes are
+        raised as urllib2.HTTPError like urllib2.urlopen does.
+        """
+        for _ in xrange(self.max_redirects + 1):
+            parsed = urlparse.urlparse(url)
+
+            path = parsed.path or '/'
+            if parsed.query:
+                path += '?' + parsed.query
+
+            response, contents = self.fetch (
+                parsed.scheme, parsed.netloc, path, headers, timeout
+            )
+
+            location = response.getheader('location')
+
+            if response.status in self.redirect_codes and location:
+                url = urlparse.urljoin(url, location)
+                continue
+
+            if response.status >= 300:
+                raise urllib2.HTTPError (
+                    url, response.status, response.reason, response.msg, None
+                )
+
+            return response, contents
+
+        raise urllib2.HTTPError (
+            url, response.status, 'too many redirects', response.msg, None
+        )
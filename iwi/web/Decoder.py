@@ -0,0 +1,170 @@
+import collections
+import importlib
+import re
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['Decoder']
+
+class Decoder (object):
+    """
+    Thread-safe JSON decoder with pluggable backends.
+
+    The fastest backend that can be imported is picked unless one is asked
+    for. Decoded objects of keys that are decoded more than once at the same
+    version, like threads that did not change between two passes, are kept
+    and handed out again instead of being decoded anew, so the objects this
+    returns must not be modified.
+    """
+    # backends by module name, fastest first
+    preference = ('ujson', 'simplejson', 'json')
+
+    # how many decoded objects of hot keys to keep
+    cache_size = 128
+
+    # how many keys that were decoded once to remember
+    seen_size = 4096
+
+    whitespace = re.compile(r'[ \t\n\r]*')
+
+    def __init__ (self, backend=None):
+        """
+        Initializes an instance from the name of a backend, by default the
+        fastest one available.
+        """
+        self.lock  = threading.Lock()
+        self.seen  = collections.OrderedDict()
+        self.cache = collections.OrderedDict()
+
+        self.set_backend(backend)
+
+    @classmethod
+    def available (cls):
+        """
+        Returns the names of the backends that can be imported, fastest first.
+        """
+        names = []
+
+        for name in cls.preference:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                continue
+
+            names.append(name)
+
+        return names
+
+    def set_backend (self, name=None):
+        """
+        Switches to a backend by name, or to the fastest one available if no
+        name is given.
+        """
+        if name is None:
+            name = self.available()[0]
+
+        module = importlib.import_module(name)
+
+        self.backend = name
+        self.loads   = module.loads
+
+        # backends without raw_decode can not stream
+        if hasattr(module, 'JSONDecoder'):
+            self.raw_decode = module.JSONDecoder().raw_decode
+        else:
+            self.raw_decode = None
+
+        logger.debug('decoding JSON with %s', name)
+
+    def clear (self):
+        """
+        Forgets every decoded object and every key seen.
+        """
+        with self.lock:
+            self.seen.clear()
+            self.cache.clear()
+
+    def decode (self, s, key=None, version=None):
+        """
+        Decodes and returns the JSON object in s, raises ValueError if s is not
+        valid JSON.
+
+        If a key and a version, like a Last-Modified value, are given the
+        object is handed out from the cache when the key was decoded at the
+        same version before.
+        """
+        if key is None or version is None:
+            return self.loads(s)
+
+        with self.lock:
+            if key in self.cache:
+                cached_version, obj = self.cache.pop(key)
+
+                if cached_version == version:
+                    self.cache[key] = version, obj
+                    return obj
+
+            hot = self.seen.pop(key, None) == version
+
+        obj = self.loads(s)
+
+        with self.lock:
+            if hot:
+                self.cache[key] = version, obj
+
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            else:
+                self.seen[key] = version
+
+                while len(self.seen) > self.seen_size:
+                    self.seen.popitem(last=False)
+
+        return obj
+
+    def iter_array (self, s):
+        """
+        Yields the elements of the JSON array in s one at a time as they are
+        decoded, raises ValueError once s turns out not to be a valid array.
+
+        Backends that can not decode part of a string decode all of it first.
+        """
+        if self.raw_decode is None:
+            array = self.loads(s)
+
+            if not isinstance(array, list):
+                raise ValueError ('not a JSON array')
+
+            for element in array:
+                yield element
+            return
+
+        index = self.whitespace.match(s).end()
+
+        if s[index:index + 1] != '[':
+            raise ValueError ('not a JSON array')
+
+        index = self.whitespace.match(s, index + 1).end()
+
+        if s[index:index + 1] == ']':
+            return
+
+        while True:
+            element, index = self.raw_decode(s, index)
+            yield element
+
+            index = self.whitespace.match(s, index).end()
+            delimiter = s[index:index + 1]
+
+            if delimiter == ']':
+                return
+
+            if delimiter != ',':
+                raise ValueError (
+                    'expected , or ] at character {}'.format(index)
+                )
+
+            index = self.whitespace.match(s, index + 1).end()
@@ -0,0 +1,54 @@
+import mmap
+
+from . import CacheStore
+
+__all__ = ['MappedCacheStore']
+
+class MappedCacheStore (CacheStore):
+    """
+    CacheStore that memory-maps its segments and serves contents as zero-copy
+    buffers into the mappings.
+
+    Processes mapping the same segments share the page cache instead of each
+    holding its own copy of the contents.
+    """
+    @classmethod
+    def from_store (cls, store):
+        """
+        Initializes an instance from an already opened CacheStore, taking over
+        its index. Nothing is written, records still buffered by the writer
+        are flushed when their segment is mapped.
+        """
+        for reader in store.readers.values():
+            reader.close()
+        store.readers.clear()
+
+        mapped = cls.__new__(cls)
+        mapped.__dict__.update(store.__dict__)
+
+        return mapped
+
+    def read (self, segment, offset, length):
+        """
+        Returns a buffer of length bytes at offset into a segment.
+
+        Segments are mapped on first use and mapped again if they have grown
+        past the mapped size since.
+        """
+        self.detach()
+
+        mapping = self.readers.get(segment)
+
+        if mapping is None or offset + length > len(mapping):
+            if self.writer is not None:
+                self.writer.flush()
+
+            # buffers handed out earlier keep the old mapping alive
+            with open(self.segment_path(segment), 'rb') as infile:
+                mapping = mmap.mmap (
+                    infile.fileno(), 0, access=mmap.ACCESS_READ
+                )
+
+            self.readers[segment] = mapping
+
+        return buffer(mapping, offset, length)
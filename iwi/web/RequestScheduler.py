@@ -0,0 +1,160 @@
+import threading
+import urlparse
+
+from . import TokenBucket
+from . import URLOpenErrorStrategy
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+__all__ = ['RequestScheduler']
+
+class RequestScheduler (object):
+    """
+    Thread-safe scheduler that spaces out requests per host with token
+    buckets.
+
+    When a host answers that it is being hammered the rate for that host is
+    cut and then slowly recovers as requests succeed. Hosts without a limit
+    are cut from unlimited_rate and go back to no limit once they recover to
+    it.
+    """
+    # how much the rate is cut by when a host throttles us
+    backoff_factor = 0.5
+
+    # the rate never drops below this fraction of the configured rate
+    backoff_floor = 1.0 / 16
+
+    # fraction of the configured rate recovered per successful request
+    recovery_step = 1.0 / 32
+
+    # seconds to pause a host that throttles us without saying for how long
+    backoff_pause = 5.0
+
+    # the rate backoffs and recovery of hosts without a limit are relative to
+    unlimited_rate = 16.0
+
+    def __init__ (self, default_rate=None, burst=1.0):
+        """
+        Initializes an instance from the rate in requests per second for hosts
+        without a limit of their own and the number of requests that may be
+        made back to back.
+
+        A rate of None or 0 means no limit.
+        """
+        self.default_rate = default_rate
+        self.burst = burst
+
+        self.limits  = {}
+        self.buckets = {}
+
+        self.issued    = 0
+        self.throttled = 0
+        self.waited    = 0.0
+        self.backoffs  = 0
+
+        self.lock = threading.Lock()
+
+    def bucket (self, url):
+        """
+        Returns the bucket for the host of the URL.
+        """
+        host = urlparse.urlparse(url).netloc
+
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket (
+                    self.limits.get(host, self.default_rate), self.burst
+                )
+
+            return self.buckets[host]
+
+    def set_limit (self, host, rate):
+        """
+        Sets the rate in requests per second for a host.
+        """
+        with self.lock:
+            self.limits[host] = rate
+
+            if host in self.buckets:
+                self.buckets[host].set_rate(rate)
+
+    def acquire (self, url):
+        """
+        Reserves a request to the URL and returns the number of seconds to
+        wait before making it.
+        """
+        wait = self.bucket(url).reserve()
+
+        with self.lock:
+            self.issued += 1
+
+            if wait > 0:
+                self.throttled += 1
+                self.waited += wait
+
+        return wait
+
+    def register_error (self, url, error):
+        """
+        Cuts the rate for the host of the URL if the error says that we are
+        making too many requests.
+        """
+        if not URLOpenErrorStrategy.throttled(error):
+            return
+
+        bucket = self.bucket(url)
+        host = urlparse.urlparse(url).netloc
+
+        with self.lock:
+            self.backoffs += 1
+            rate = self.limits.get(host, self.default_rate)
+
+        try:
+            pause = float(error.hdrs.get('retry-after'))
+        except (AttributeError, TypeError, ValueError):
+            pause = self.backoff_pause
+
+        rate = rate or self.unlimited_rate
+
+        bucket.set_rate (
+            max (
+                (bucket.rate or rate) * self.backoff_factor,
+                rate * self.backoff_floor
+            )
+        )
+
+        logger.warning (
+            'backing off %s for %s seconds at %s requests per second',
+            host, pause, bucket.rate
+        )
+        bucket.pause(pause)
+
+    def register_success (self, url):
+        """
+        Lets the rate for the host of the URL recover towards its limit.
+        """
+        bucket = self.bucket(url)
+        host = urlparse.urlparse(url).netloc
+
+        with self.lock:
+            rate = self.limits.get(host, self.default_rate)
+
+        limit = rate or self.unlimited_rate
+
+        if bucket.rate and bucket.rate < limit:
+            recovered = min(bucket.rate + limit * self.recovery_step, limit)
+            bucket.set_rate(rate if recovered == limit else recovered)
+
+    def statistics (self):
+        """
+        Returns the counters of the scheduler as a dictionary.
+        """
+        with self.lock:
+            return {
+                'issued'    : self.issued,
+                'throttled' : self.throttled,
+                'waited'    : self.waited,
+                'backoffs'  : self.backoffs
+            }
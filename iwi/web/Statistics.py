@@ -0,0 +1,90 @@
+import collections
+import contextlib
+import threading
+import time
+
+__all__ = ['Statistics']
+
+class Statistics (object):
+    """
+    Thread-safe named counters, timers and maxima.
+
+    Counters add up occurrences or amounts, timers add up seconds spent in a
+    stage and maxima keep the highest value seen, like a queue depth.
+    """
+    def __init__ (self):
+        """
+        Initializes an instance with every value at zero.
+        """
+        self.lock = threading.Lock()
+        self.reset()
+
+    def count (self, name, amount=1):
+        """
+        Adds amount to a counter.
+        """
+        with self.lock:
+            self.counters[name] += amount
+
+    def add_time (self, name, seconds):
+        """
+        Adds a number of seconds to a timer.
+        """
+        with self.lock:
+            self.timers[name] += seconds
+
+    def maximum (self, name, value):
+        """
+        Raises a maximum to value if it is higher.
+        """
+        with self.lock:
+            if value > self.maxima.get(name, value - 1):
+                self.maxima[name] = value
+
+    @contextlib.contextmanager
+    def timer (self, name):
+        """
+        Returns a context manager that adds the time spent in its block to a
+        timer.
+        """
+        started = time.time()
+
+        try:
+            yield
+        finally:
+            self.add_time(name, time.time() - started)
+
+    def merge (self, statistics):
+        """
+        Adds the values of a dictionary returned by statistics, like the one of
+        another process, to this instance.
+        """
+        with self.lock:
+            for name, amount in statistics.get('counters', {}).items():
+                self.counters[name] += amount
+
+            for name, seconds in statistics.get('timers', {}).items():
+                self.timers[name] += seconds
+
+            for name, value in statistics.get('maxima', {}).items():
+                self.maxima[name] = max(value, self.maxima.get(name, value))
+
+    def reset (self):
+        """
+        Sets every value back to zero.
+        """
+        with self.lock:
+            self.counters = collections.defaultdict(int)
+            self.timers   = collections.defaultdict(float)
+            self.maxima   = {}
+
+    def statistics (self):
+        """
+        Returns copies of the counters, timers and maxima as a dictionary.
+        """
+        with self.lock:
+            return {
+                'counters' : dict(self.counters),
+                'timers'   : dict(self.timers),
+                'maxima'   : dict(self.maxima)
+            }
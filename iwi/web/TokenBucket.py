@@ -0,0 +1,80 @@
+import threading
+import time
+
+__all__ = ['TokenBucket']
+
+class TokenBucket (object):
+    """
+    Thread-safe token bucket with an adjustable rate.
+
+    Tokens are reserved ahead of time, so a caller learns how long it has to
+    wait for its token instead of polling for it.
+    """
+    def __init__ (self, rate, burst=1.0):
+        """
+        Initializes an instance from a rate in tokens per second and the
+        number of tokens that may be taken at once.
+
+        A rate of None or 0 means that the bucket never runs dry.
+        """
+        self.rate  = rate
+        self.burst = burst
+
+        self.tokens = burst
+        self.stamp  = time.time()
+
+        self.lock = threading.Lock()
+
+    def refill (self, now):
+        """
+        Adds the tokens accumulated since the last refill, not thread-safe.
+        """
+        if self.stamp < now:
+            self.tokens = min (
+                self.burst, self.tokens + (now - self.stamp) * self.rate
+            )
+            self.stamp = now
+
+    def reserve (self):
+        """
+        Takes a token and returns the number of seconds to wait before it may
+        be used.
+        """
+        if not self.rate:
+            # only a pause holds back a bucket that never runs dry
+            return max(self.stamp - time.time(), 0.0)
+
+        with self.lock:
+            now = time.time()
+
+            self.refill(now)
+            self.tokens -= 1
+
+            if self.tokens >= 0:
+                return max(self.stamp - now, 0.0)
+
+            return self.stamp - now - self.tokens / self.rate
+
+    def pause (self, seconds):
+        """
+        Hands out no tokens for the next number of seconds, this holds for
+        buckets that never run dry too.
+        """
+        with self.lock:
+            now = time.time()
+
+            if self.rate:
+                self.refill(now)
+
+            self.tokens = min(self.tokens, 0.0)
+            self.stamp  = max(self.stamp, now + seconds)
+
+    def set_rate (self, rate):
+        """
+        Changes the rate, keeping the tokens accumulated so far.
+        """
+        with self.lock:
+            if self.rate:
+                self.refill(time.time())
+
+            self.rate = rate
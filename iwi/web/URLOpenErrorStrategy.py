@@ -11,6 +11,19 @@ class URLOpenErrorStrategy (RetryStrategy):
     A base class for retry strategies that want to handle common urllib2.urlopen
     errors in a sensible manner.
     """
+    # status codes sent by servers that want fewer requests
+    throttle_codes = (408, 429)
+
+    @classmethod
+    def throttled (cls, error):
+        """
+        Returns whether the error means that the server wants fewer requests.
+        """
+        return (
+            isinstance(error, urllib2.HTTPError) and
+            error.code in cls.throttle_codes
+        )
+
     def register_error (self, error):
         """
         Registers an error with the retry strategy.
@@ -25,9 +38,7 @@ class URLOpenErrorStrategy (RetryStrategy):
         except httplib.IncompleteRead:
             pass
         except urllib2.HTTPError as e:
-            if e.code == 408:
-                return
-            if e.code == 429:
+            if self.throttled(e):
                 return
             if e.code >= 300:
                 self.exhaust()
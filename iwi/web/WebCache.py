@@ -1,9 +1,10 @@
+import email.utils
+import marshal
+import os
 import socket
 import threading
 import time
 
-import zlib
-
 import httplib
 import urllib2
 import urlparse
@@ -13,6 +14,12 @@ try:
 except ImportError:
     import pickle
 
+from . import CacheStore
+from . import Codec
+from . import ConnectionPool
+from . import MappedCacheStore
+from . import RequestScheduler
+from . import Statistics
 from . import UniformRetryStrategy
 
 import logging
@@ -25,7 +32,19 @@ class WebCache (object):
     """
     Allows for thread-safe cached downloads, honors last-modified.
 
-    WebCache can also write and read the cache to and from disk.
+    WebCache can also write and read the cache to and from disk, on disk the
+    cache is kept in a CacheStore so only changed entries are written and
+    contents are read on demand.
+
+    Counters and per-stage timings of requests, retries and the cache are kept
+    in statistics.
+
+    Entries are compressed with codec, entries compressed with other codecs,
+    like by an older version, are still read.
+
+    With keep_parsed set a parsed form of entries, like the posts of a thread,
+    can be stored next to the cache file, so that later runs can use it as
+    long as the entry has not changed instead of decoding it again.
     """
     # default retry parameters
     retry_times = 3
@@ -35,13 +54,23 @@ class WebCache (object):
     # default user string
     user_string = "Mozilla/5.0"
 
+    # whether entries newer than a known modification time are used as is
+    incremental = False
+
+    # whether parsed forms of entries are kept in a store next to the cache
+    keep_parsed = False
+
+    # default connection pool parameters
+    max_connections = 16
+    idle_timeout    = 30.0
+
     def __init__ (self, cache_file=None, sleeper=None):
         """
         Initializes an instance from an optional cache_file, an optional
         retrier, and an optional sleeper.
 
         The cache_file parameter may either be a filename or an open file-like
-        object.
+        object, see load.
         If the cache_file parameter is not given the cache is initialized to be
         empty.
 
@@ -49,6 +78,9 @@ class WebCache (object):
         seconds to sleep (as a floating point number).
         If the sleeper parameter is not given it is initialized as time.sleep.
         """
+        self.parsed  = None
+        self.pending = []
+
         if cache_file is None:
             self.cache = {}
         else:
@@ -56,16 +88,38 @@ class WebCache (object):
 
         if sleeper is None:
             self.sleeper = time.sleep
+        else:
+            self.sleeper = sleeper
 
         self.cache_lock = threading.Lock()
+        self.fresh = {}
+        self.local = threading.local()
         self.set_online_mode()
 
-    def download (self, url, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, bypass_cache=False):
+        self.statistics = Statistics()
+        self.codec = Codec()
+
+        self.connection_pool = ConnectionPool (
+            self.max_connections,
+            self.idle_timeout,
+            self.statistics
+        )
+
+        self.scheduler = RequestScheduler()
+
+    def download (self, url, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, bypass_cache=False, last_modified=None):
         """
         Downloads the contents from the URL, if something goes wrong it
         registers the exception with the retrier and asks for a sleep time.
+
+        The last_modified parameter is an optional UNIX timestamp of when the
+        contents were last modified, see is_unchanged.
+
+        The Last-Modified value of the contents returned is kept for the
+        calling thread, see downloaded_version.
         """
         retry = 0.0
+        self.local.version = None
 
         retrier = UniformRetryStrategy ( 
             self.retry_times,
@@ -76,10 +130,15 @@ class WebCache (object):
         while retry is not None:
             if retry:
                 logger.debug('sleeping on %s for %s seconds', url, retry)
+                self.statistics.count('retries')
+                self.statistics.add_time('retry_sleep', retry)
                 self.sleeper(retry)
 
             try:
-                return self.downloader(url, timeout=timeout, bypass_cache=bypass_cache)
+                return self.downloader (
+                    url, timeout=timeout, bypass_cache=bypass_cache,
+                    last_modified=last_modified
+                )
             except Exception as e:
                 logger.debug('got on %s exception %s', url, e)
                 retrier.register_error(e)
@@ -88,7 +147,7 @@ class WebCache (object):
 
         return ''
 
-    def download_offline (self, url, timeout=None, bypass_cache=False):
+    def download_offline (self, url, timeout=None, bypass_cache=False, last_modified=None):
         """
         Simulates downloading contents from URL while only looking it up in the
         cache.
@@ -100,54 +159,184 @@ class WebCache (object):
             raise ValueError ('Cache bypass doesn\'t make sense in offline mode.')
 
         if self.has_key(key):
-            _, contents = self.get_values(key)
-            return zlib.decompress(contents)
+            return self.not_modified(key)
 
+        self.statistics.count('cache_misses')
         raise urllib2.URLError(OSError('not in cache'))
 
-    def download_online (self, url, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, bypass_cache=False):
+    def download_online (self, url, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, bypass_cache=False, last_modified=None):
         """
         Downloads contents from the URL, using the internal cache if applicable.
+
+        Requests are made on persistent connections from the connection pool
+        once the scheduler allows them, entries that were just fetched by an
+        asynchronous engine or that are unchanged since last_modified are
+        served from the cache.
         """
-        contents = None
         key = self.url_to_key(url)
-        request = urllib2.Request(url)
-        request.add_header('User-agent', self.user_string)
 
-        if not bypass_cache and self.has_key(key):
-            lastmodified, contents = self.get_values(key)
+        if not bypass_cache:
+            fresh = self.fresh.pop(key, None)
+
+            if fresh is not None:
+                return self.not_modified(key) if fresh else ''
 
-            request.add_header('if-modified-since', lastmodified)
+            if self.is_unchanged(url, last_modified):
+                self.statistics.count('unchanged_skipped')
+                return self.not_modified(key)
+
+        headers = self.request_headers(key, bypass_cache)
+
+        wait = self.scheduler.acquire(url)
+        if wait > 0:
+            logger.debug('throttling %s for %s seconds', url, wait)
+            self.statistics.add_time('throttle_sleep', wait)
+            self.sleeper(wait)
+
+        self.statistics.count('requests')
 
         try:
-            connection   = urllib2.urlopen(request, timeout=timeout)
-            lastmodified = connection.headers.get('last-modified')
-            contents     = connection.read()
-            connection.close()
+            response, contents = self.connection_pool.request (
+                url, headers, timeout=timeout
+            )
         except urllib2.HTTPError as e:
-            if e.code == 304:
-                logger.debug (
-                    'cache hit %r not modified since %s',
-                    key, lastmodified
-                )
-                return zlib.decompress(contents)
+            if e.code == 304 and 'If-modified-since' in headers:
+                self.statistics.count('responses_304')
+                self.scheduler.register_success(url)
+                return self.not_modified(key)
+
+            self.statistics.count('errors')
+            self.scheduler.register_error(url, e)
+            raise
+        except Exception:
+            self.statistics.count('errors')
             raise
 
-        if not bypass_cache:
-            self.set_values(key, lastmodified, zlib.compress(contents))
+        self.statistics.count('responses_200')
+        self.statistics.count('bytes_received', len(contents))
+        self.scheduler.register_success(url)
 
-        return contents
+        return self.modified (
+            key, response.getheader('last-modified'), contents, bypass_cache
+        )
+
+    def add_parsed (self, entries):
+        """
+        Stores the (key, lastmodified, data) entries of parsed forms that a
+        forked process handed over, see take_parsed.
+        """
+        if self.parsed is None:
+            return
+
+        with self.cache_lock:
+            for key, lastmodified, data in entries:
+                self.parsed[key] = (lastmodified, data)
+
+    def close (self):
+        """
+        Writes pending changes to disk and closes the underlying store and the
+        pooled connections.
+        """
+        self.connection_pool.close()
+
+        if isinstance(self.cache, CacheStore):
+            self.cache.close()
+
+        if self.parsed is not None:
+            self.parsed.close()
+
+    def compact (self):
+        """
+        Reclaims disk space taken by overwritten and removed entries, not
+        thread-safe.
+        """
+        if isinstance(self.cache, CacheStore):
+            self.cache.compact()
+
+        if self.parsed is not None:
+            self.parsed.compact()
 
     def dump (self, outfile):
         """
         Writes internal cache to outfile.
 
         outfile may be a filename or an open file-like object.
+        If outfile is the filename the cache was loaded from only the changed
+        entries are written, if it is another filename the cache is copied to a
+        new store, and if it is a file-like object the cache is exported in the
+        old single-pickle format. Parsed forms are only written along with the
+        cache they were loaded with, see dump_parsed.
         """
         if isinstance(outfile, str):
-            outfile = open(outfile, 'wb')
+            if (isinstance(self.cache, CacheStore) and
+                os.path.abspath(outfile) == os.path.abspath(self.cache.path)):
+                self.cache.flush()
+                self.dump_parsed()
+                return
+
+            store = CacheStore(outfile)
+            store.update(self.cache)
+            store.close()
+            return
+
+        pickle.dump (
+            dict((key, self.cache[key]) for key in self.cache.keys()),
+            outfile, protocol=-1
+        )
+
+    def downloaded_version (self):
+        """
+        Returns the Last-Modified value of the contents the calling thread
+        downloaded last, or None if the download failed, was not cached or had
+        no such value.
+        """
+        return getattr(self.local, 'version', None)
 
-        pickle.dump(self.cache, outfile, protocol=-1)
+    def dump_parsed (self):
+        """
+        Writes the parsed forms stored since the cache was loaded, which is
+        done by dump as well.
+        """
+        if self.parsed is not None:
+            self.parsed.flush()
+
+    def get_lastmodified (self, key):
+        """
+        Returns the last-modified value of an entry in a thread-safe manner.
+        """
+        with self.cache_lock:
+            if isinstance(self.cache, CacheStore):
+                return self.cache.lastmodified(key)
+            return self.cache[key][0]
+
+    def get_parsed (self, key, lastmodified=None):
+        """
+        Returns the parsed form stored for an entry, or None if there is none
+        or if it is not of the version lastmodified, by default the version of
+        the cached entry.
+        """
+        if self.parsed is None:
+            return None
+
+        if self.has_key(key) and key in self.parsed:
+            if lastmodified is None:
+                lastmodified = self.get_lastmodified(key)
+
+            with self.cache_lock:
+                if (lastmodified is not None and
+                    self.parsed.lastmodified(key) == lastmodified):
+                    _, data = self.parsed[key]
+                else:
+                    data = None
+
+            if data is not None:
+                self.statistics.count('parsed_hits')
+
+                with self.statistics.timer('unmarshal'):
+                    return marshal.loads(self.codec.decompress(data))
+
+        self.statistics.count('parsed_misses')
+        return None
 
     def get_values (self, key):
         """
@@ -164,49 +353,235 @@ class WebCache (object):
         logger.debug('looking for %r in cache', key)
         return key in self.cache
 
+    def is_unchanged (self, url, last_modified):
+        """
+        Returns whether incremental mode is on and the cached entry for the URL
+        is at least as new as the UNIX timestamp last_modified, in which case
+        it can be used without asking the server.
+        """
+        if not self.incremental or last_modified is None:
+            return False
+
+        key = self.url_to_key(url)
+
+        if not self.has_key(key):
+            return False
+
+        timestamp = self.timestamp(self.get_lastmodified(key))
+        if timestamp is None:
+            return False
+
+        return timestamp >= last_modified
+
     def keys (self):
         """
         Makes a copy of the list of keys and returns it.
         """
         return self.cache.keys()
 
+    def mark_fresh (self, key, success=True):
+        """
+        Marks an entry as just fetched so that the next download of it is
+        served from the cache without a request, or as failed so that it
+        returns nothing.
+        """
+        self.fresh[key] = success
+
+    def merge (self, path):
+        """
+        Copies the entries of the cache file at path that are newer than the
+        ones in this cache, or missing from it, into this cache.
+
+        Returns the number of entries copied.
+        """
+        other  = CacheStore(path)
+        copied = 0
+
+        for key in other.keys():
+            lastmodified, contents = other[key]
+
+            if self.has_key(key):
+                ours   = self.timestamp(self.get_lastmodified(key))
+                theirs = self.timestamp(lastmodified)
+
+                if theirs is None or (ours is not None and ours >= theirs):
+                    continue
+
+            with self.cache_lock:
+                self.cache[key] = (lastmodified, contents)
+
+            copied += 1
+
+        other.close()
+
+        # parsed forms are only of use if they are of the entry kept
+        if self.parsed is not None and os.path.exists(path + '.parsed'):
+            other = CacheStore(path + '.parsed')
+
+            for key in other.keys():
+                if (self.has_key(key) and
+                    self.get_lastmodified(key) == other.lastmodified(key)):
+                    with self.cache_lock:
+                        self.parsed[key] = other[key]
+
+            other.close()
+
+        return copied
+
+    def modified (self, key, lastmodified, contents, bypass_cache=False):
+        """
+        Stores freshly downloaded contents and returns them.
+        """
+        if not bypass_cache:
+            with self.statistics.timer('compress'):
+                compressed = self.codec.compress(contents)
+
+            self.statistics.count('bytes_stored', len(compressed))
+            self.set_values(key, lastmodified, compressed)
+
+            self.local.version = lastmodified
+
+        return contents
+
+    def not_modified (self, key):
+        """
+        Returns the cached contents of an entry that was not modified.
+        """
+        logger.debug('cache hit %r', key)
+        self.statistics.count('cache_hits')
+
+        lastmodified, contents = self.get_values(key)
+        self.local.version = lastmodified
+
+        with self.statistics.timer('decompress'):
+            return self.codec.decompress(contents)
+
     def load (self, infile):
         """
         Loads internal cache from infile.
 
         infile may be a filename or an open file-like object.
+        A filename is opened lazily as a CacheStore, migrating caches in the
+        old single-pickle format, while a file-like object is read as an old
+        single-pickle cache and kept in memory.
+
+        With keep_parsed set the parsed forms of a filename are kept in a
+        CacheStore at the filename with a '.parsed' suffix, only this process
+        writes to it, the processes it forks hand theirs over, see
+        take_parsed.
         """
-        try:
-            if isinstance(infile, str):
-                infile = open(infile, 'rb')
+        self.parsed  = None
+        self.pending = []
+
+        if isinstance(infile, str):
+            self.cache = CacheStore(infile)
+
+            if self.keep_parsed:
+                self.parsed = CacheStore(infile + '.parsed')
+                self.owner  = os.getpid()
+            return
 
+        try:
             self.cache = pickle.load(infile)
         except IOError:
             self.cache = {}
 
+    def take_parsed (self):
+        """
+        Returns and forgets the parsed forms a forked process kept, as
+        (key, lastmodified, data) entries for add_parsed in the parent.
+        """
+        with self.cache_lock:
+            entries, self.pending = self.pending, []
+
+        return entries
+
+    @staticmethod
+    def timestamp (lastmodified):
+        """
+        Returns a Last-Modified header value as a UNIX timestamp, or None if it
+        is missing or can not be parsed.
+        """
+        if lastmodified is None:
+            return None
+
+        parsed = email.utils.parsedate_tz(lastmodified)
+        if parsed is None:
+            return None
+
+        return email.utils.mktime_tz(parsed)
+
     def url_to_key (self, url):
         """
         Takes an url and returns a key for use in the cache.
         """
         return urlparse.urlparse(url).path
 
+    def request_headers (self, key, bypass_cache=False):
+        """
+        Returns the headers of a request for an entry, asking only for
+        modified contents if the entry is cached.
+        """
+        headers = {'User-agent' : self.user_string}
+
+        if not bypass_cache and self.has_key(key):
+            lastmodified = self.get_lastmodified(key)
+
+            if lastmodified is not None:
+                headers['If-modified-since'] = lastmodified
+
+        return headers
+
     def remove_key (self, key):
         """
         Removes an entry from the cache, not thread-safe.
         """
         del self.cache[key]
 
+        if self.parsed is not None and key in self.parsed:
+            del self.parsed[key]
+
     def set_offline_mode (self):
         """
         Sets offline mode for the webcache.
+
+        An on-disk cache is memory-mapped so that contents are decompressed
+        straight from the mapping.
         """
+        if (isinstance(self.cache, CacheStore) and
+            not isinstance(self.cache, MappedCacheStore)):
+            self.cache = MappedCacheStore.from_store(self.cache)
+
         self.downloader = self.download_offline
+        self.online = False
 
     def set_online_mode (self):
         """
         Sets online mode for the webcache.
         """
         self.downloader = self.download_online
+        self.online = True
+
+    def set_parsed (self, key, lastmodified, parsed):
+        """
+        Stores the parsed form of an entry at version lastmodified, parsed may
+        hold anything marshal can write.
+
+        Nothing is stored without a lastmodified value to check it against. A
+        forked process, which must not write to the same store, keeps the
+        parsed form for take_parsed instead.
+        """
+        if self.parsed is None or lastmodified is None:
+            return
+
+        with self.statistics.timer('marshal'):
+            data = self.codec.compress(marshal.dumps(parsed, marshal.version))
+
+        with self.cache_lock:
+            if os.getpid() != self.owner:
+                self.pending.append((key, lastmodified, data))
+            else:
+                self.parsed[key] = (lastmodified, data)
 
     def set_values (self, key, *args):
         """
@@ -4,12 +4,24 @@ from RetryStrategy        import RetryStrategy
 from URLOpenErrorStrategy import URLOpenErrorStrategy
 from UniformRetryStrategy import UniformRetryStrategy
 
-from Links    import Links
-from WebCache import WebCache
+from Statistics       import Statistics
+from TokenBucket      import TokenBucket
+from RequestScheduler import RequestScheduler
+
+from Links            import Links
+from Decoder          import Decoder
+from Codec            import Codec
+from AsyncFetcher     import AsyncFetcher
+from ConnectionPool   import ConnectionPool
+from CacheStore       import CacheStore
+from MappedCacheStore import MappedCacheStore
+from WebCache         import WebCache
 
 from boards import boards, all_boards
 
 __all__ = ['boards', 'all_boards', 'html',
-           'Links', 'WebCache',
+           'Links', 'Decoder', 'Codec', 'WebCache', 'CacheStore', 'MappedCacheStore',
+           'ConnectionPool', 'AsyncFetcher',
+           'Statistics', 'TokenBucket', 'RequestScheduler',
            'RetryStrategy', 'URLOpenErrorStrategy',
            'UniformRetryStrategy']
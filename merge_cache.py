@@ -0,0 +1,38 @@
+#! /usr/bin/env python
+
+from iwi.core      import WebEntity
+
+from common import logger
+from common import parameters
+
+def merge_cache (*shards):
+    """
+    Merges cache files into the internal WebEntity.webcache, for every entry
+    the newest version found is kept.
+    """
+    for shard in shards:
+        copied = WebEntity.webcache.merge(shard)
+        logger.info('merged %d entries from %s', copied, shard)
+
+if __name__ == '__main__':
+    from common import CommonParser
+
+    parser = CommonParser (
+        description='Merges cache files into the web cache.',
+        epilog='the shards are typically written by build_cache.py --shard',
+        engine=False
+    )
+
+    parser.add_argument (
+        'shard', nargs='+',
+        help='cache files to merge into the cache file'
+    )
+
+    args = parser.parse_args()
+
+    if parser.sanity_check(args):
+        exit(1)
+
+    parser.pre_process(args)
+    merge_cache(*args.shard)
+    parser.post_process(args)
@@ -16,7 +16,11 @@ def prune_cache (*links):
     This function accepts only links to boards and pages.
     If no links are given every board on 4chan is checked.
     """
-    pool = Pool(num_threads=parameters.num_threads)
+    pool = Pool (
+        num_threads=parameters.num_threads,
+        max_jobs=parameters.max_jobs,
+        statistics=WebEntity.webcache.statistics
+    )
 
     def work (unit):
         if isinstance(unit, Thread):
@@ -57,12 +61,16 @@ def prune_cache (*links):
         logger.info('pruning %s', key)
         WebEntity.webcache.remove_key(key)
 
+    if keys:
+        WebEntity.webcache.compact()
+
 if __name__ == '__main__':
     from common import OfflineParser
 
     parser = OfflineParser (
         description='Prunes 404ed entries from the web cache.',
-        epilog='if no links are given all of 4chan is scraped'
+        epilog='if no links are given all of 4chan is scraped',
+        engine=False
     )
 
     parser.add_argument (
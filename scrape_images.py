@@ -5,6 +5,7 @@ import time
 
 from iwi.core      import classify
 from iwi.core      import Post
+from iwi.core      import WebEntity
 from iwi.threading import Pool
 
 from common import logger
@@ -22,9 +23,15 @@ def get_filename (directory, post, keep_names=False):
 
 def scrape_images (directory, keep_names, *links):
     """
-    Downloads images from links.
+    Downloads images from links, images are written as soon as they are
+    downloaded.
     """
-    pool = Pool(num_threads=parameters.num_threads)
+    pool = Pool (
+        num_threads=parameters.num_threads,
+        max_results=parameters.max_results,
+        max_jobs=parameters.max_jobs,
+        statistics=WebEntity.webcache.statistics
+    )
 
     def work (unit):
         if isinstance(unit, Post):
@@ -51,38 +58,26 @@ def scrape_images (directory, keep_names, *links):
 
     for link in map(classify, links):
         pool.push(work, link)
-    pool.join()
-
-    logger.info('Join complete.')
 
-    downloaded = pool.get_results()
-    pool.close()
-
-    logger.info('Setting up directories')
+    for filename, image_data in pool.iter_results():
+        parent = os.path.split(filename)[0]
 
-    directories = set (
-        map (
-            lambda t : os.path.split(t[0])[0],
-            downloaded
-        )
-    )
+        if not os.path.exists(parent):
+            logger.debug('making directory %s', parent)
+            os.makedirs(parent)
 
-    for directory in directories:
-        if not os.path.exists(directory):
-            logger.debug('making directory %s', directory)
-            os.makedirs(directory)
-
-    logger.info('Writing images to disk.')
-
-    for filename, image_data in downloaded:
         with open(filename, 'w') as outfile:
             outfile.write(image_data)
 
+    logger.info('Join complete.')
+    pool.close()
+
 if __name__ == '__main__':
     from common import CommonParser
 
     parser = CommonParser (
-        description='Scrapes images from the given 4chan links.'
+        description='Scrapes images from the given 4chan links.',
+        engine=False
     )
 
     parser.add_argument (